@@ -2,6 +2,7 @@
 
 import numpy as np
 from scipy.interpolate import interp1d
+from scipy.linalg import solve_banded
 from QuantLib import ShiftedLognormal, Normal
 import QuantLib as ql
 
@@ -23,9 +24,7 @@ class BaseFDSABR:
         if volatility_type == Normal:
             return
         elif volatility_type == ShiftedLognormal:
-            premiums = [
-                self.priceCallTransformedSABRDensity(strike) for strike in k
-            ]
+            premiums = self.price_calls(k)
             # print(premiums)
             return [
                 func_getImpliedShiftedBlackVolatility(
@@ -88,6 +87,36 @@ class BaseFDSABR:
             'PR': PR
         }
 
+    ## same step as solveStep, but the tridiagonal matrix is kept as the
+    ## (3, M) banded layout of scipy.linalg.solve_banded
+    ## invdFm: 1/(Fm[1:]-Fm[:-1]), constant over the time steps
+    ## ab: work buffer of the three diagonals, overwritten
+    ## out: work buffer receiving the solution
+    @staticmethod
+    def solveStepBanded(invdFm, Cm, Em, dt, h, P, PL, PR, ab, out):
+        frac = dt/(2*h)
+        M = len(P)
+        CEm = Cm*Em
+        ab[1, 1:(M-1)] = 1+frac*(CEm[1:(M-1)]*(invdFm[1:(M-1)]+invdFm[0:(M-2)]))
+        ab[0, 2:M] = -frac*CEm[2:M]*invdFm[1:(M-1)]
+        ab[2, 0:(M-2)] = -frac*CEm[0:(M-2)]*invdFm[0:(M-2)]
+        ab[1, 0] = CEm[0]*invdFm[0]
+        ab[0, 1] = CEm[1]*invdFm[0]
+        ab[1, M-1] = CEm[M-1]*invdFm[M-2]
+        ab[2, M-2] = CEm[M-2]*invdFm[M-2]
+        P[0] = 0
+        P[M-1] = 0
+        out[:] = P
+        P = solve_banded((1, 1), ab, out, overwrite_ab=True, overwrite_b=True,
+                         check_finite=False)
+        PL = PL+dt*CEm[1]*invdFm[0]*P[1]
+        PR = PR+dt*CEm[M-2]*invdFm[M-2]*P[M-2]
+        return {
+            'P': P,
+            'PL': PL,
+            'PR': PR
+        }
+
     def priceCallTransformedSABRDensity(self, strike):
         if not self.cached:
             print('probability density was not cached.')
@@ -121,7 +150,60 @@ class BaseFDSABR:
                 p += np.sum((Fm-(strike+self.shift))*self.h*self.P[k])
         return p
 
-    def makeTransformedSABRDensityLawsonSwayne(self, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift=0):
+    ## call prices of all strikes from one pass over the cached density
+    ## the partial sums over the grid cells are precomputed by
+    ## cacheCellForwards, so each strike costs O(1) after an O(N) setup
+    ## strikes: array of strikes
+    def price_calls(self, strikes):
+        if not self.cached:
+            print('probability density was not cached.')
+            return
+
+        strikes = np.asarray(strikes, dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ystrike = self.yOfStrike(strikes, self.forward, self.beta, self.shift)
+            zstrike = -1/self.nu*np.log((np.sqrt(1-self.rho**2+(self.rho+self.nu*ystrike/self.alpha)**2)-self.rho-self.nu*ystrike/self.alpha)/(1-self.rho))
+        p = np.full(strikes.shape, np.nan)
+        lower = zstrike <= self.zmin
+        p[lower] = self.forward-strikes[lower]
+        p[zstrike >= self.zmax] = 0
+        inside = (zstrike > self.zmin) & (zstrike < self.zmax)
+        shifted_strikes = strikes[inside]+self.shift
+        k0 = np.ceil((zstrike[inside]-self.zmin)/self.h).astype(int)
+        M = len(self.P)
+        q = (self.Fmax-shifted_strikes)*self.PR
+        term = self.Fedge[k0]-shifted_strikes
+        term = np.where(term > 1e-5, term, 0)
+        dFdz = (self.Fedge[k0]-self.Fcell[k0])/(0.5*self.h)
+        q += 0.5*term**2*self.P[k0]/dFdz
+        q += np.where(
+            k0+1 == M-1,
+            (self.Fcell[M-1]-shifted_strikes)*self.h*self.P[M-1],
+            self.moment1[k0+1]-shifted_strikes*self.moment0[k0+1])
+        p[inside] = q
+        return p
+
+    ## forwards at the cell edges and centers of the cached grid and the
+    ## partial zeroth/first moments of the density over cells k..M-2
+    def cacheCellForwards(self):
+        M = len(self.P)
+        k = np.arange(M)
+        self.Fmax = self.makeForward(self.alpha, self.beta, self.nu, self.rho, self.forward, self.zmax, self.shift)
+        self.Fedge = self.makeForward(self.alpha, self.beta, self.nu, self.rho, self.forward, self.zmin+k*self.h, self.shift)
+        self.Fcell = np.empty(M)
+        self.Fcell[0] = self.Fm[0]
+        self.Fcell[1:] = self.makeForward(self.alpha, self.beta, self.nu, self.rho, self.forward, self.zmin+(k[1:]-0.5)*self.h, self.shift)
+        hP = self.h*self.P
+        hP[0] = 0
+        hP[M-1] = 0
+        self.moment0 = np.cumsum(hP[::-1])[::-1]
+        self.moment1 = np.cumsum((self.Fcell*hP)[::-1])[::-1]
+
+    def makeTransformedSABRDensityLawsonSwayne(self, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift=0, solver='banded'):
+        if solver not in ('banded', 'dense'):
+            print('Unknown solver was selected.')
+            return
+
         tmp = self.computeBoundaries(alpha, beta, nu, rho, forward, T, nd, shift)
         zmin = tmp['zmin']
         zmax = tmp['zmax']
@@ -159,21 +241,38 @@ class BaseFDSABR:
         PR = 0
         P = np.zeros(J+2)
         P[j0] = 1/h
+        if solver == 'banded':
+            # work buffers shared by all time steps
+            invdFm = 1/(Fm[1:]-Fm[:-1])
+            ab = np.zeros((3, J+2))
+            work1 = np.empty(J+2)
+            work2 = np.empty(J+2)
         for t in range(timesteps):
-            Em = Em*Emdt1
-            tmp = self.solveStep(Fm, Cm, Em, dt1, h, P, PL, PR)
+            Em *= Emdt1
+            if solver == 'banded':
+                tmp = self.solveStepBanded(invdFm, Cm, Em, dt1, h, P, PL, PR, ab, work1)
+            else:
+                tmp = self.solveStep(Fm, Cm, Em, dt1, h, P, PL, PR)
             P1 = tmp['P']
             PL1 = tmp['PL']
             PR1 = tmp['PR']
-            Em = Em*Emdt1
-            tmp = self.solveStep(Fm, Cm, Em, dt1, h, P1, PL1, PR1)
+            Em *= Emdt1
+            if solver == 'banded':
+                tmp = self.solveStepBanded(invdFm, Cm, Em, dt1, h, P1, PL1, PR1, ab, work2)
+            else:
+                tmp = self.solveStep(Fm, Cm, Em, dt1, h, P1, PL1, PR1)
             P2 = tmp['P']
             PL2 = tmp['PL']
             PR2 = tmp['PR']
-            P = (np.sqrt(2)+1)*P2-np.sqrt(2)*P1
+            if solver == 'banded':
+                P1 *= -np.sqrt(2)
+                P2 *= np.sqrt(2)+1
+                np.add(P1, P2, out=P)
+            else:
+                P = (np.sqrt(2)+1)*P2-np.sqrt(2)*P1
             PL = (np.sqrt(2)+1)*PL2-np.sqrt(2)*PL1
             PR = (np.sqrt(2)+1)*PR2-np.sqrt(2)*PR1
-            Em = Em*Emdt2
+            Em *= Emdt2
 
         P[P < 0] = 0
         self.forward = forward
@@ -195,6 +294,7 @@ class BaseFDSABR:
         self.h = h
         self.probability_density = P/Cm
         self.cached = True
+        self.cacheCellForwards()
 
 class ArbitrageFreeSABR(BaseFDSABR):
     def __init__(self):
@@ -324,8 +424,8 @@ if __name__  ==  '__main__':
            ['Arbitrage-Free SABR', 'Free-Boundary SABR'],
            None, None, './advancedSABR_pdf.pdf')
 
-    prems_af = [af.priceCallTransformedSABRDensity(k) for k in strikes]
-    prems_fb = [fb.priceCallTransformedSABRDensity(k) for k in strikes]
+    prems_af = af.price_calls(strikes)
+    prems_fb = fb.price_calls(strikes)
     vol_af = af.volatility(strikes)
     vol_fb = fb.volatility(strikes)
 
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+## quasi-random numbers for Monte Carlo pricing
+## scrambled Sobol (Joe-Kuo direction numbers) and Halton sequences of
+## scipy.stats.qmc generated in blocks, with skip-ahead to split one sequence
+## into parallel streams and Brownian-bridge construction of multi-step paths
+
+import time
+import numpy as np
+from scipy.stats import qmc
+from scipy.special import ndtri
+
+SEQUENCES = {
+    'sobol': qmc.Sobol,
+    'halton': qmc.Halton
+}
+
+class QuasiRandomGenerator:
+    ## dimension: dimension of the points, e.g. the number of time steps
+    ## sequence: 'sobol' or 'halton'
+    ## scramble: randomize the sequence (Owen-type scrambling of Sobol,
+    ##           permutations of Halton), which keeps its low discrepancy
+    ## seed: seed of the scrambling, generators sharing the seed generate
+    ##       pieces of the same sequence
+    ## skip: number of points skipped at the start of the sequence
+    def __init__(self, dimension, sequence='sobol', scramble=True, seed=None, skip=0):
+        if sequence not in SEQUENCES:
+            print('Unknown sequence was selected.')
+            return
+
+        self.dimension = dimension
+        self.sequence = sequence
+        self.scramble = scramble
+        self.seed = seed
+        self.engine = SEQUENCES[sequence](dimension, scramble=scramble, rng=seed)
+        self.skip(skip)
+
+    ## skip-ahead of n points without generating them
+    def skip(self, n):
+        if n > 0:
+            self.engine.fast_forward(n)
+        return self
+
+    ## the index-th of the parallel streams of size points each, the streams
+    ## of one seed being consecutive disjoint blocks of the same sequence
+    def stream(self, index, size):
+        return QuasiRandomGenerator(
+            self.dimension, self.sequence, self.scramble, self.seed, index*size)
+
+    ## block of n uniform points of shape (n, dimension), n being preferably
+    ## a power of 2 for Sobol
+    def uniform(self, n):
+        return self.engine.random(n)
+
+    ## block of n standard normal points by the inverse normal cdf
+    def normal(self, n):
+        u = self.uniform(n)
+        # the first point of the unscrambled Sobol sequence is 0, which is
+        # better skipped with skip=1
+        np.clip(u, np.finfo(float).tiny, None, out=u)
+        return ndtri(u)
+
+## Brownian bridge construction of Brownian paths from normal variates
+## the first variate sets the terminal value and each following one the
+## midpoint of an interval already fixed, so that the leading (most uniform)
+## dimensions of a quasi-random point carry most of the variance of the path
+class BrownianBridge:
+    ## times: increasing times of the path, excluding 0
+    def __init__(self, times):
+        self.times = np.asarray(times, dtype=float)
+        m = len(self.times)
+        t = np.concatenate([[0], self.times])
+        # index of the point set by each variate, its left and right
+        # neighbours already set (-1 for the origin, m for none) and weights
+        self.index = np.zeros(m, dtype=int)
+        self.left = np.zeros(m, dtype=int)
+        self.right = np.zeros(m, dtype=int)
+        self.left_weight = np.zeros(m)
+        self.right_weight = np.zeros(m)
+        self.stdev = np.zeros(m)
+        self.index[0] = m-1
+        self.left[0] = -1
+        self.right[0] = m
+        self.left_weight[0] = 1
+        self.stdev[0] = np.sqrt(t[m])
+        intervals = [(-1, m-1)]
+        k = 1
+        while intervals:
+            l, r = intervals.pop(0)
+            if r-l < 2:
+                continue
+            i = (l+r)//2
+            tl, ti, tr = t[l+1], t[i+1], t[r+1]
+            self.index[k] = i
+            self.left[k] = l
+            self.right[k] = r
+            self.left_weight[k] = (tr-ti)/(tr-tl)
+            self.right_weight[k] = (ti-tl)/(tr-tl)
+            self.stdev[k] = np.sqrt((ti-tl)*(tr-ti)/(tr-tl))
+            intervals += [(l, i), (i, r)]
+            k += 1
+
+    ## Brownian values at times of shape (n, len(times)) from normal variates
+    ## of the same shape
+    def transform(self, z):
+        n, m = z.shape
+        # column 0 is the origin, columns 1..m the times
+        w = np.zeros((n, m+1))
+        for k in range(m):
+            i = self.index[k]+1
+            value = self.stdev[k]*z[:, k]
+            if k == 0:
+                w[:, i] = value
+            else:
+                w[:, i] = (self.left_weight[k]*w[:, self.left[k]+1]
+                           + self.right_weight[k]*w[:, self.right[k]+1] + value)
+        return w[:, 1:]
+
+    ## Brownian increments over the time steps
+    def increments(self, z):
+        return np.diff(self.transform(z), axis=1, prepend=0)
+
+
+if __name__ == '__main__':
+    from scipy.special import ndtr
+
+    # European call on Geometric Brownian Motion simulated on 16 steps,
+    # spread of the estimates over 32 independent randomizations
+    S, K, r, sigma, T = 100, 110, 0.03, 0.25, 1.0
+    steps = 16
+    times = np.linspace(0, T, steps+1)[1:]
+    stdev = sigma*np.sqrt(T)
+    d1 = (np.log(S/K)+r*T)/stdev+0.5*stdev
+    exact = S*ndtr(d1)-K*np.exp(-r*T)*ndtr(d1-stdev)
+    bridge = BrownianBridge(times)
+
+    def price(z, use_bridge):
+        if use_bridge:
+            w = bridge.transform(z)[:, -1]
+        else:
+            w = (z*np.sqrt(T/steps)).sum(axis=1)
+        ST = S*np.exp((r-0.5*sigma**2)*T+sigma*w)
+        return np.exp(-r*T)*np.maximum(ST-K, 0).mean()
+
+    for n in [2**10, 2**12, 2**14]:
+        rng = np.random.default_rng(0)
+        rmse = {}
+        for method in ['pseudo', 'sobol', 'sobol_bridge', 'halton_bridge']:
+            start = time.time()
+            estimates = []
+            for seed in range(32):
+                if method == 'pseudo':
+                    z = rng.standard_normal((n, steps))
+                else:
+                    sequence = method.split('_')[0]
+                    z = QuasiRandomGenerator(steps, sequence, seed=seed).normal(n)
+                estimates.append(price(z, method.endswith('bridge')))
+            rmse[method] = np.sqrt(np.mean((np.array(estimates)-exact)**2))
+        print('n = {0}: '.format(n)+', '.join(
+            '{0} {1:.2e}'.format(key, value) for key, value in rmse.items()))
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+## two-dimensional finite-difference SABR engine in (forward, log-volatility)
+## dF = alpha*(F+shift)**beta*dW1, dalpha = nu*alpha*dW2, dW1*dW2 = rho*dt
+## x = log(alpha) so that the backward PDE in time to maturity tau is
+## V_tau = 1/2*exp(2x)*C(f)**2*V_ff+rho*nu*exp(x)*C(f)*V_fx
+##         +1/2*nu**2*(V_xx-V_x)-r*V
+## with f = F+shift and C(f) = f**beta, the forward being absorbed at f = 0
+## the operator is split into the mixed term A0 and the terms A1 in f and A2
+## in x, and the time stepping is the ADI scheme of Craig-Sneyd or
+## Hundsdorfer-Verwer (in 't Hout, K. J., & Foulon, S. (2010). ADI finite
+## difference schemes for option pricing in the Heston model with
+## correlation) on scipy.sparse operators, the LU factorizations of
+## I-theta*dt*A1 and I-theta*dt*A2 being reused over all time steps
+## all strikes of a strip are solved together as the columns of one system
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from QuantLib import ShiftedLognormal, Normal
+from fdsabr import func_getImpliedShiftedBlackVolatilitiesOfCalls
+from fdsabr import func_getImpliedNormalVolatilitiesOfCalls
+
+SCHEMES = ('douglas', 'craig_sneyd', 'hundsdorfer_verwer')
+
+## first and second derivative matrices on a non-uniform grid x
+## the boundary rows of the first derivative are one-sided, those of the
+## second derivative and of the central first derivative are zero
+def derivativeMatrices(x):
+    n = len(x)
+    hl = x[1:(n-1)]-x[0:(n-2)]
+    hr = x[2:n]-x[1:(n-1)]
+    i = np.arange(1, n-1)
+    rows = np.concatenate((i, i, i))
+    cols = np.concatenate((i-1, i, i+1))
+    D1c = sp.csr_matrix((
+        np.concatenate((-hr/(hl*(hl+hr)), (hr-hl)/(hl*hr), hl/(hr*(hl+hr)))),
+        (rows, cols)), shape=(n, n))
+    D2 = sp.csr_matrix((
+        np.concatenate((2/(hl*(hl+hr)), -2/(hl*hr), 2/(hr*(hl+hr)))),
+        (rows, cols)), shape=(n, n))
+    h0 = x[1]-x[0]
+    hn = x[n-1]-x[n-2]
+    D1 = D1c+sp.csr_matrix((
+        [-1/h0, 1/h0, -1/hn, 1/hn], ([0, 0, n-1, n-1], [0, 1, n-2, n-1])),
+        shape=(n, n))
+    return D1, D1c, D2
+
+class ADISABR:
+    def __init__(self):
+        self.cached = False
+
+    ## grid of fGrid forwards on [-shift, Fmax] concentrated around the
+    ## forward by a sinh transform, and of xGrid log-volatilities within
+    ## nd_volatility standard deviations, both containing the spot values as
+    ## nodes
+    ## concentration: width of the concentration in units of the forward
+    ## Fmax: upper boundary, by default nd normal standard deviations of the
+    ##       forward inflated by exp(nu*sqrt(T)) for the volatility of
+    ##       volatility
+    def makeGrid(self, alpha, beta, nu, rho, forward, T, fGrid, xGrid, nd=5, shift=0, risk_free_rate=0, concentration=0.1, Fmax=None, nd_volatility=3):
+        f0 = forward+shift
+        if Fmax is None:
+            sd = alpha*f0**beta*np.sqrt(T)
+            fmax = f0+nd*sd*np.exp(nu*np.sqrt(T))
+        else:
+            fmax = Fmax+shift
+        c = concentration*f0
+        b = np.arcsinh(-f0/c)
+        a = np.arcsinh((fmax-f0)/c)-b
+        f = f0+c*np.sinh(a*np.linspace(0, 1, fGrid)+b)
+        f[0] = 0
+        i0 = np.argmin(np.abs(f-f0))
+        f[i0] = f0
+
+        x0 = np.log(alpha)
+        xmin = x0-0.5*nu**2*T-nd_volatility*nu*np.sqrt(T)
+        xmax = x0-0.5*nu**2*T+nd_volatility*nu*np.sqrt(T)
+        hx = (xmax-xmin)/(xGrid-1)
+        j0 = int(np.clip(np.round((x0-xmin)/hx), 1, xGrid-2))
+        x = x0+(np.arange(xGrid)-j0)*hx
+
+        D1f, D1fc, D2f = derivativeMatrices(f)
+        D1x, D1xc, D2x = derivativeMatrices(x)
+        If = sp.identity(fGrid, format='csr')
+        Ix = sp.identity(xGrid, format='csr')
+        Cf = f**beta
+        Cf[0] = 0 if beta > 0 else 1
+        ex = np.exp(x)
+        # coefficients on the flattened grid, index i*xGrid+j for (f[i], x[j])
+        diffusion = 0.5*np.outer(Cf**2, ex**2).reshape(-1)
+        mixed = rho*nu*np.outer(Cf, ex).reshape(-1)
+        I = sp.identity(fGrid*xGrid, format='csc')
+        self.A0 = sp.diags(mixed) @ sp.kron(D1fc, D1xc, format='csr')
+        self.A1 = (sp.diags(diffusion) @ sp.kron(D2f, Ix, format='csr')
+                   - 0.5*risk_free_rate*I).tocsr()
+        self.A2 = (0.5*nu**2*sp.kron(If, D2x-D1x, format='csr')
+                   - 0.5*risk_free_rate*I).tocsr()
+        self.A = (self.A0+self.A1+self.A2).tocsr()
+        self.I = I
+        self.factorizations = {}
+
+        self.alpha = alpha
+        self.beta = beta
+        self.nu = nu
+        self.rho = rho
+        self.forward = forward
+        self.T = T
+        self.shift = shift
+        self.risk_free_rate = risk_free_rate
+        self.f = f
+        self.x = x
+        self.i0 = i0
+        self.j0 = j0
+        self.cached = True
+
+    ## LU factorization of I-theta_dt*A_direction, computed once per step size
+    def factorization(self, direction, theta_dt):
+        key = (direction, theta_dt)
+        if key not in self.factorizations:
+            A = self.A1 if direction == 1 else self.A2
+            self.factorizations[key] = splu((self.I-theta_dt*A).tocsc())
+        return self.factorizations[key]
+
+    ## one ADI step of size dt of the values U (one column per payoff)
+    def step(self, U, dt, scheme, theta):
+        lu1 = self.factorization(1, theta*dt)
+        lu2 = self.factorization(2, theta*dt)
+        A1U = self.A1 @ U
+        A2U = self.A2 @ U
+        Y0 = U+dt*(self.A0 @ U+A1U+A2U)
+        Y1 = lu1.solve(Y0-theta*dt*A1U)
+        Y2 = lu2.solve(Y1-theta*dt*A2U)
+        if scheme == 'douglas':
+            return Y2
+
+        if scheme == 'craig_sneyd':
+            Y0 = Y0+0.5*dt*(self.A0 @ (Y2-U))
+            Y1 = lu1.solve(Y0-theta*dt*A1U)
+            return lu2.solve(Y1-theta*dt*A2U)
+
+        # hundsdorfer_verwer
+        A1Y2 = self.A1 @ Y2
+        A2Y2 = self.A2 @ Y2
+        Y0 = Y0+0.5*dt*(self.A0 @ (Y2-U)+A1Y2-A1U+A2Y2-A2U)
+        Y1 = lu1.solve(Y0-theta*dt*A1Y2)
+        return lu2.solve(Y1-theta*dt*A2Y2)
+
+    ## values on the whole grid of the payoffs of shape (fGrid, nPayoffs)
+    ## at maturity, rolled back over timesteps steps of which the first
+    ## damping_steps are Douglas steps with theta = 1 smoothing the kinks
+    ## theta: 1/2 for craig_sneyd, 1/2+sqrt(3)/6 for hundsdorfer_verwer by
+    ##        default
+    ## returns the values of shape (fGrid, xGrid, nPayoffs)
+    def rollback(self, payoffs, timesteps, damping_steps=2, scheme='hundsdorfer_verwer', theta=None):
+        if not self.cached:
+            print('grid was not cached.')
+            return
+
+        if scheme not in SCHEMES:
+            print('Unknown scheme was selected.')
+            return
+
+        if theta is None:
+            theta = 0.5+np.sqrt(3)/6 if scheme == 'hundsdorfer_verwer' else 0.5
+        xGrid = len(self.x)
+        U = np.repeat(payoffs, xGrid, axis=0)
+        dt = self.T/timesteps
+        for t in range(timesteps):
+            if t < damping_steps:
+                U = self.step(U, dt, 'douglas', 1.0)
+            else:
+                U = self.step(U, dt, scheme, theta)
+        return U.reshape(len(self.f), xGrid, -1)
+
+    ## call prices of all strikes from one rollback of the strip
+    def price_calls(self, strikes, timesteps=100, damping_steps=2, scheme='hundsdorfer_verwer', theta=None):
+        if not self.cached:
+            print('grid was not cached.')
+            return
+
+        strikes = np.asarray(strikes, dtype=float)
+        payoffs = np.maximum(self.f[:, None]-(strikes[None, :]+self.shift), 0)
+        U = self.rollback(payoffs, timesteps, damping_steps, scheme, theta)
+        if U is None:
+            return
+        return U[self.i0, self.j0]
+
+    def volatility(self, strikes, volatility_type=ShiftedLognormal, timesteps=100, damping_steps=2, scheme='hundsdorfer_verwer'):
+        if volatility_type == Normal:
+            premiums = self.price_calls(strikes, timesteps, damping_steps, scheme)
+            if premiums is None:
+                return
+            return func_getImpliedNormalVolatilitiesOfCalls(
+                premiums, strikes, self.forward, self.risk_free_rate, self.T)
+        elif volatility_type == ShiftedLognormal:
+            premiums = self.price_calls(strikes, timesteps, damping_steps, scheme)
+            if premiums is None:
+                return
+            return func_getImpliedShiftedBlackVolatilitiesOfCalls(
+                premiums, strikes, self.forward, self.risk_free_rate, self.T,
+                self.shift)
+        else:
+            print('Unknown volatility type was selected.')
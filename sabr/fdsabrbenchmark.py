@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+## benchmark of the finite-difference SABR engines
+## sweeps N, timesteps and parameter regimes, measures the wall time and the
+## peak memory of building a density and pricing a strike strip, and
+## - the discretization error: maximum price/volatility error against a
+##   fine-grid solve of the same engine (SELF_REFERENCE)
+## - the model gap: maximum price/volatility difference to
+##   ql.FdSabrVanillaEngine (2D finite differences) and
+##   ql.NoArbSabrSmileSection, which does not vanish as the grid is refined
+##   since the 1D engines solve an effective model of SABR
+## writing the results as JSON; timings and memory depend on the machine, so
+## a baseline is only comparable when it was produced on the same one
+## usage: python fdsabrbenchmark.py [output] [--baseline previous_output]
+##        [--quick]
+
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+import scipy
+import QuantLib as ql
+from fdsabr import ArbitrageFreeSABR
+from fdsabr import FreeBoundarySABR
+from fdsabr import func_getImpliedShiftedBlackVolatilitiesOfCalls
+
+ENGINES = {
+    'arbitrage_free': ArbitrageFreeSABR,
+    'free_boundary': FreeBoundarySABR
+}
+
+REGIMES = {
+    'base': {
+        'alpha': 0.026, 'beta': 0.5, 'nu': 0.4, 'rho': -0.1,
+        'forward': 0.0488, 'T': 1.0, 'shift': 0.0
+    },
+    'low_forward': {
+        'alpha': 0.042, 'beta': 0.5, 'nu': 0.3, 'rho': -0.3,
+        'forward': 0.005, 'T': 2.0, 'shift': 0.0
+    },
+    'negative_forward': {
+        'alpha': 0.02, 'beta': 0.5, 'nu': 0.4, 'rho': -0.1,
+        'forward': -0.004, 'T': 1.0, 'shift': 0.02
+    },
+    'high_nu': {
+        'alpha': 0.026, 'beta': 0.5, 'nu': 1.0, 'rho': -0.3,
+        'forward': 0.0488, 'T': 5.0, 'shift': 0.02
+    }
+}
+
+SWEEP = {
+    'N': [100, 200, 400],
+    'timesteps_per_year': [25, 50, 100]
+}
+
+QUICK_SWEEP = {
+    'N': [100],
+    'timesteps_per_year': [50]
+}
+
+## tGrid, fGrid, xGrid of ql.FdSabrVanillaEngine
+REFERENCE_GRID = (100, 800, 100)
+
+## N and timesteps per year of the fine-grid self-reference
+SELF_REFERENCE = (3200, 400)
+
+## strikes within +-width standard deviations of the forward, the standard
+## deviation being approximated by the normal volatility alpha*F**beta
+def make_strikes(regime, n=21, width=2.5):
+    F = regime['forward']+regime['shift']
+    sd = regime['alpha']*F**regime['beta']*np.sqrt(regime['T'])
+    strikes = regime['forward']+np.linspace(-width, width, n)*sd
+    return strikes[strikes > -regime['shift']+1e-4]
+
+## undiscounted call prices of the shifted SABR model by 2D finite
+## differences, the shift being applied to the forward and the strikes
+def price_reference_fd(regime, strikes, grid=REFERENCE_GRID):
+    today = ql.Settings.instance().evaluationDate
+    dc = ql.Actual365Fixed()
+    maturity = today+int(round(regime['T']*365))
+    risk_free_ts = ql.YieldTermStructureHandle(ql.FlatForward(today, 0.0, dc))
+    engine = ql.FdSabrVanillaEngine(
+        regime['forward']+regime['shift'], regime['alpha'], regime['beta'],
+        regime['nu'], regime['rho'], risk_free_ts, *grid)
+    prices = []
+    for strike in strikes:
+        option = ql.VanillaOption(
+            ql.PlainVanillaPayoff(ql.Option.Call, strike+regime['shift']),
+            ql.EuropeanExercise(maturity))
+        option.setPricingEngine(engine)
+        prices.append(option.NPV())
+    return np.array(prices)
+
+## undiscounted call prices of the no-arbitrage SABR smile section, None
+## where QuantLib rejects the parameters
+def price_reference_noarb(regime, strikes):
+    try:
+        section = ql.NoArbSabrSmileSection(
+            regime['T'], regime['forward']+regime['shift'],
+            [regime['alpha'], regime['beta'], regime['nu'], regime['rho']])
+        return np.array([
+            section.optionPrice(strike+regime['shift'], ql.Option.Call, 1.0)
+            for strike in strikes
+        ])
+    except RuntimeError:
+        return None
+
+def max_error(x, y):
+    error = np.abs(np.asarray(x)-np.asarray(y))
+    error = error[np.isfinite(error)]
+    return float(np.max(error)) if len(error) > 0 else None
+
+## build one density and price the strike strip, repeat times
+## returns the best wall time, the peak traced memory and the prices and
+## volatilities of the last run
+def measure(engine, regime, strikes, N, timesteps, nd, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model = ENGINES[engine]()
+        model.makeTransformedSABRDensityLawsonSwayne(
+            regime['alpha'], regime['beta'], regime['nu'], regime['rho'],
+            regime['forward'], regime['T'], N, timesteps, nd, regime['shift'])
+        prices = model.price_calls(strikes)
+        timings.append(time.perf_counter()-start)
+
+    tracemalloc.start()
+    model = ENGINES[engine]()
+    model.makeTransformedSABRDensityLawsonSwayne(
+        regime['alpha'], regime['beta'], regime['nu'], regime['rho'],
+        regime['forward'], regime['T'], N, timesteps, nd, regime['shift'])
+    model.price_calls(strikes)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    volatilities = model.volatility(strikes)
+    return min(timings), peak_memory, prices, volatilities
+
+## undiscounted call prices of engine on the fine grid SELF_REFERENCE
+def price_self_reference(engine, regime, strikes, nd, grid=SELF_REFERENCE):
+    model = ENGINES[engine]()
+    model.makeTransformedSABRDensityLawsonSwayne(
+        regime['alpha'], regime['beta'], regime['nu'], regime['rho'],
+        regime['forward'], regime['T'], grid[0],
+        max(1, int(round(grid[1]*regime['T']))), nd, regime['shift'])
+    return model.price_calls(strikes)
+
+def implied_volatilities(prices, strikes, regime):
+    if prices is None:
+        return None
+    return func_getImpliedShiftedBlackVolatilitiesOfCalls(
+        prices, strikes, regime['forward'], 0, regime['T'], regime['shift'])
+
+def errors_against(prices, volatilities, reference, reference_volatilities):
+    if reference is None:
+        return None
+    return {
+        'price': max_error(prices, reference),
+        'volatility': max_error(volatilities, reference_volatilities)
+    }
+
+def run(regimes=REGIMES, sweep=SWEEP, engines=ENGINES, nd=6, repeat=3):
+    ql.Settings.instance().evaluationDate = ql.Date(15, ql.June, 2020)
+    results = []
+    for regime_name, regime in regimes.items():
+        strikes = make_strikes(regime)
+        references = {
+            'FdSabrVanillaEngine': price_reference_fd(regime, strikes),
+            'NoArbSabrSmileSection': price_reference_noarb(regime, strikes)
+        }
+        reference_volatilities = {
+            name: implied_volatilities(prices, strikes, regime)
+            for name, prices in references.items()
+        }
+        for engine in engines:
+            self_reference = price_self_reference(engine, regime, strikes, nd)
+            self_reference_volatilities = implied_volatilities(
+                self_reference, strikes, regime)
+            for N in sweep['N']:
+                for timesteps_per_year in sweep['timesteps_per_year']:
+                    timesteps = max(1, int(round(timesteps_per_year*regime['T'])))
+                    wall_time, peak_memory, prices, volatilities = measure(
+                        engine, regime, strikes, N, timesteps, nd, repeat)
+                    errors = errors_against(
+                        prices, volatilities, self_reference,
+                        self_reference_volatilities)
+                    model_gap = {
+                        name: errors_against(
+                            prices, volatilities, references[name],
+                            reference_volatilities[name])
+                        for name in references
+                    }
+                    results.append({
+                        'engine': engine,
+                        'regime': regime_name,
+                        'N': N,
+                        'timesteps': timesteps,
+                        'wall_time': wall_time,
+                        'peak_memory': peak_memory,
+                        'errors': errors,
+                        'model_gap': model_gap
+                    })
+                    print('{0:15s} {1:17s} N={2:4d} timesteps={3:4d} '
+                          'time={4:.4f}[sec] memory={5:.0f}[KB] '
+                          'error(price)={6:.2e} '
+                          'model_gap(FdSabrVanillaEngine)={7:.2e}'.format(
+                              engine, regime_name, N, timesteps, wall_time,
+                              peak_memory/1024, errors['price'],
+                              model_gap['FdSabrVanillaEngine']['price']))
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'QuantLib': ql.__version__,
+            'machine': platform.machine()
+        },
+        'settings': {
+            'nd': nd,
+            'repeat': repeat,
+            'reference_grid': list(REFERENCE_GRID),
+            'self_reference': list(SELF_REFERENCE),
+            'regimes': regimes
+        },
+        'results': results
+    }
+
+## relative change of wall time and errors against a previous run for the
+## cases present in both
+def compare(baseline, current):
+    def key(result):
+        return (result['engine'], result['regime'], result['N'], result['timesteps'])
+
+    previous = {key(result): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        old_error = (old.get('errors') or {}).get('price')
+        new_error = (result.get('errors') or {}).get('price')
+        rows.append({
+            'case': key(result),
+            'wall_time': result['wall_time']/old['wall_time'],
+            'peak_memory': result['peak_memory']/old['peak_memory'],
+            'price_error': (new_error/old_error
+                            if old_error and new_error is not None else None)
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output', nargs='?', default='fdsabrbenchmark.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+
+    report = run(sweep=QUICK_SWEEP if args.quick else SWEEP,
+                 repeat=1 if args.quick else 3)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for row in compare(baseline, report):
+            print('{0} time x{1:.2f} memory x{2:.2f} error(price) x{3}'.format(
+                row['case'], row['wall_time'], row['peak_memory'],
+                'n/a' if row['price_error'] is None else '{0:.2f}'.format(row['price_error'])))
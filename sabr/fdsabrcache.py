@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+## on-disk cache of finite-difference SABR densities shared by processes
+## each density is the flat array of its SABRDensityResult in one .npy file
+## which is memory-mapped on load, the least recently used files are evicted
+
+import os
+import glob
+import hashlib
+import numpy as np
+from fdsabrresult import SABRDensityResult
+
+class DensityCache:
+    ## directory: directory of the cache files, created if missing
+    ## max_entries: maximum number of cached densities
+    ## max_bytes: maximum total size of the cache files, None for no limit
+    def __init__(self, directory, max_entries=1000, max_bytes=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(model, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift=0):
+        params = (
+            type(model).__name__, float(alpha), float(beta), float(nu),
+            float(rho), float(forward), float(T), int(N), int(timesteps),
+            float(nd), float(shift)
+        )
+        return hashlib.sha1(repr(params).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    ## restore the density into model if it is cached, returns True on a hit
+    def load(self, model, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift=0):
+        path = self.path(self.key(
+            model, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift))
+        try:
+            result = SABRDensityResult(np.load(path, mmap_mode='r'))
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        model.setResult(result)
+        return True
+
+    def save(self, model, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift=0):
+        path = self.path(self.key(
+            model, alpha, beta, nu, rho, forward, T, N, timesteps, nd, shift))
+        data = model.result.data
+        # write aside and rename so that readers never see a partial file
+        tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.npy')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(reverse=True)
+        total_bytes = 0
+        for i, (mtime, size, path) in enumerate(entries):
+            total_bytes += size
+            if i >= self.max_entries or (
+                self.max_bytes is not None and total_bytes > self.max_bytes):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, '*.npy')):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+## build the finite-difference SABR densities of a whole smile cube
+## (e.g. expiry x tenor cells of swaptions) in a pool of worker processes
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from fdsabr import ArbitrageFreeSABR
+from fdsabr import FreeBoundarySABR
+
+ENGINES = {
+    'arbitrage_free': ArbitrageFreeSABR,
+    'free_boundary': FreeBoundarySABR
+}
+
+## solve one cell and return its SABRDensityResult, which is sent back
+## to the parent process as one flat buffer
+## engine: key of ENGINES
+## cell: keyword arguments of makeTransformedSABRDensityLawsonSwayne
+def build_cell(engine, cell):
+    model = ENGINES[engine]()
+    model.makeTransformedSABRDensityLawsonSwayne(**cell)
+    return model.result
+
+## build the densities of all cells and return the cached models in order
+## cells: list of dicts with alpha, beta, nu, rho, forward, T and optionally
+##        N, timesteps, nd, shift
+## engine: 'arbitrage_free' or 'free_boundary'
+## workers: number of worker processes, None for os.cpu_count(), 1 to run
+##          in this process
+## settings: defaults of N, timesteps, nd, shift shared by all cells
+def build_cube(cells, engine='arbitrage_free', workers=None, **settings):
+    if engine not in ENGINES:
+        print('Unknown engine was selected.')
+        return
+
+    cells = [dict(settings, **cell) for cell in cells]
+    if workers == 1:
+        results = [build_cell(engine, cell) for cell in cells]
+    else:
+        workers = workers or os.cpu_count()
+        chunksize = max(1, len(cells)//(4*workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                build_cell, [engine]*len(cells), cells, chunksize=chunksize))
+
+    return [ENGINES[engine].fromResult(result) for result in results]
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    cells = [
+        {
+            'alpha': rng.uniform(0.02, 0.03), 'beta': 0.5,
+            'nu': rng.uniform(0.3, 0.5), 'rho': rng.uniform(-0.3, 0.1),
+            'forward': rng.uniform(0.03, 0.05), 'T': T
+        }
+        for T in [0.5, 1, 2, 5, 10] for tenor in range(20)
+    ]
+
+    for workers in [1, None]:
+        start = time.time()
+        cube = build_cube(cells, 'free_boundary', workers,
+                          N=400, timesteps=200, nd=6, shift=0.02)
+        print('workers = {0}, elapsed time:{1:.2f}[sec]'.format(
+            workers, time.time()-start))
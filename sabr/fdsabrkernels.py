@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+## kernels of the coefficient functions Y, F, C, G and yOfStrike of the
+## finite-difference SABR engines, evaluated without temporary arrays
+## the backend is selected at import time: Numba ufuncs fusing each formula
+## into one loop if numba is installed, NumPy with out= buffers otherwise
+## the parameters are scalars, the last argument a scalar or an array and
+## out an optional array receiving the result
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND = 'numpy' if numba is None else 'numba'
+
+def _buffer(x, out):
+    x = np.asarray(x, dtype=float)
+    if out is None:
+        out = np.empty(x.shape)
+    return x, out
+
+if numba is None:
+    def Y(alpha, nu, rho, z, out=None):
+        z, out = _buffer(z, out)
+        tmp = np.multiply(nu, z, out=np.empty(z.shape))
+        np.sinh(tmp, out=out)
+        np.cosh(tmp, out=tmp)
+        tmp -= 1
+        tmp *= rho
+        out += tmp
+        out *= alpha/nu
+        return out[()]
+
+    def forwardArbitrageFree(forward, beta, ym, shift=0, out=None):
+        ym, out = _buffer(ym, out)
+        np.multiply(1-beta, ym, out=out)
+        out += (forward+shift)**(1-beta)
+        np.power(out, 1/(1-beta), out=out)
+        return out[()]
+
+    def forwardFreeBoundary(forward, beta, ym, shift=0, out=None):
+        ym, out = _buffer(ym, out)
+        u = np.multiply(1-beta, ym)
+        u += np.sign(forward+shift)*np.abs(forward+shift)**(1-beta)
+        np.abs(u, out=out)
+        np.power(out, 1/(1-beta), out=out)
+        np.copysign(out, u, out=out)
+        return out[()]
+
+    def _diffusion(alpha, beta, rho, nu, ym, Fm, out):
+        ym, out = _buffer(ym, out)
+        tmp = np.square(ym, out=np.empty(ym.shape))
+        tmp *= nu**2
+        np.multiply(2*rho*alpha*nu, ym, out=out)
+        out += alpha**2
+        out += tmp
+        np.sqrt(out, out=out)
+        np.power(Fm, beta, out=tmp)
+        out *= tmp
+        return out[()]
+
+    def diffusionArbitrageFree(alpha, beta, rho, nu, ym, Fm, out=None):
+        return _diffusion(alpha, beta, rho, nu, ym, Fm, out)
+
+    def diffusionFreeBoundary(alpha, beta, rho, nu, ym, Fm, out=None):
+        return _diffusion(alpha, beta, rho, nu, ym, np.abs(Fm), out)
+
+    def _gamma(forward, beta, Fm, shift, out, absolute):
+        Fm, out = _buffer(Fm, out)
+        np.add(Fm, shift, out=out)
+        if absolute:
+            np.abs(out, out=out)
+        np.power(out, beta, out=out)
+        out -= np.abs(forward+shift)**beta if absolute else (forward+shift)**beta
+        out /= Fm-forward
+        return out
+
+    def gammaArbitrageFree(forward, beta, Fm, j0, shift=0, out=None):
+        G = _gamma(forward, beta, Fm, shift, out, False)
+        G[j0] = beta/(forward+shift)**(1-beta)
+        return G
+
+    def gammaFreeBoundary(forward, beta, Fm, j0, shift=0, out=None):
+        G = _gamma(forward, beta, Fm, shift, out, True)
+        G[j0] = np.sign(forward+shift)*beta/np.abs(forward+shift)**(1-beta)
+        return G
+
+    def yOfStrikeArbitrageFree(strike, forward, beta, shift=0, out=None):
+        strike, out = _buffer(strike, out)
+        np.add(strike, shift, out=out)
+        np.power(out, 1-beta, out=out)
+        out -= (forward+shift)**(1-beta)
+        out /= 1-beta
+        return out[()]
+
+    def yOfStrikeFreeBoundary(strike, forward, beta, shift=0, out=None):
+        strike, out = _buffer(strike, out)
+        u = np.add(strike, shift)
+        np.abs(u, out=out)
+        np.power(out, 1-beta, out=out)
+        out *= np.sign(u)
+        out -= np.sign(forward+shift)*np.abs(forward+shift)**(1-beta)
+        out /= 1-beta
+        return out[()]
+else:
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _Y(alpha, nu, rho, z):
+        return alpha/nu*(np.sinh(nu*z)+rho*(np.cosh(nu*z)-1))
+
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _forwardArbitrageFree(forward, beta, ym, shift):
+        return ((forward+shift)**(1-beta)+(1-beta)*ym)**(1/(1-beta))
+
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _forwardFreeBoundary(forward, beta, ym, shift):
+        u = np.sign(forward+shift)*np.abs(forward+shift)**(1-beta)+(1-beta)*ym
+        return np.sign(u)*np.abs(u)**(1/(1-beta))
+
+    @numba.vectorize(['float64(float64, float64, float64, float64, float64, float64)'], cache=True)
+    def _diffusionArbitrageFree(alpha, beta, rho, nu, ym, Fm):
+        return np.sqrt(alpha**2+2*rho*alpha*nu*ym+nu**2*ym**2)*Fm**beta
+
+    @numba.vectorize(['float64(float64, float64, float64, float64, float64, float64)'], cache=True)
+    def _diffusionFreeBoundary(alpha, beta, rho, nu, ym, Fm):
+        return np.sqrt(alpha**2+2*rho*alpha*nu*ym+nu**2*ym**2)*np.abs(Fm)**beta
+
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _gammaArbitrageFree(forward, beta, Fm, shift):
+        return ((Fm+shift)**beta-(forward+shift)**beta)/(Fm-forward)
+
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _gammaFreeBoundary(forward, beta, Fm, shift):
+        return (np.abs(Fm+shift)**beta-np.abs(forward+shift)**beta)/(Fm-forward)
+
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _yOfStrikeArbitrageFree(strike, forward, beta, shift):
+        return ((strike+shift)**(1-beta)-(forward+shift)**(1-beta))/(1-beta)
+
+    @numba.vectorize(['float64(float64, float64, float64, float64)'], cache=True)
+    def _yOfStrikeFreeBoundary(strike, forward, beta, shift):
+        return (np.sign(strike+shift)*np.abs(strike+shift)**(1-beta)-np.sign(forward+shift)*np.abs(forward+shift)**(1-beta))/(1-beta)
+
+    def _call(kernel, args, out):
+        return kernel(*args) if out is None else kernel(*args, out=out)
+
+    def Y(alpha, nu, rho, z, out=None):
+        return _call(_Y, (alpha, nu, rho, z), out)
+
+    def forwardArbitrageFree(forward, beta, ym, shift=0, out=None):
+        return _call(_forwardArbitrageFree, (forward, beta, ym, shift), out)
+
+    def forwardFreeBoundary(forward, beta, ym, shift=0, out=None):
+        return _call(_forwardFreeBoundary, (forward, beta, ym, shift), out)
+
+    def diffusionArbitrageFree(alpha, beta, rho, nu, ym, Fm, out=None):
+        return _call(_diffusionArbitrageFree, (alpha, beta, rho, nu, ym, Fm), out)
+
+    def diffusionFreeBoundary(alpha, beta, rho, nu, ym, Fm, out=None):
+        return _call(_diffusionFreeBoundary, (alpha, beta, rho, nu, ym, Fm), out)
+
+    def gammaArbitrageFree(forward, beta, Fm, j0, shift=0, out=None):
+        G = _call(_gammaArbitrageFree, (forward, beta, Fm, shift), out)
+        G[j0] = beta/(forward+shift)**(1-beta)
+        return G
+
+    def gammaFreeBoundary(forward, beta, Fm, j0, shift=0, out=None):
+        G = _call(_gammaFreeBoundary, (forward, beta, Fm, shift), out)
+        G[j0] = np.sign(forward+shift)*beta/np.abs(forward+shift)**(1-beta)
+        return G
+
+    def yOfStrikeArbitrageFree(strike, forward, beta, shift=0, out=None):
+        return _call(_yOfStrikeArbitrageFree, (strike, forward, beta, shift), out)
+
+    def yOfStrikeFreeBoundary(strike, forward, beta, shift=0, out=None):
+        return _call(_yOfStrikeFreeBoundary, (strike, forward, beta, shift), out)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+## compact read-only result of a finite-difference SABR density
+## all fields are views of one contiguous float64 array laid out as
+## [M, scalars..., Fm, Cm, P] with M the number of cells, the scalars also
+## recording the settings the density was solved with (nd, timesteps),
+## so that a result is shared between processes
+## (shared memory, memory-mapped files, pickling) as one flat buffer
+## everything else the pricer needs (cell centers, edge forwards, partial
+## moments) is rebuilt from these fields by BaseFDSABR.price_calls
+
+import numpy as np
+
+class SABRDensityResult:
+    SCALARS = ('alpha', 'beta', 'nu', 'rho', 'forward', 'T', 'shift',
+               'PL', 'PR', 'zmin', 'zmax', 'Fmax', 'h', 'nd', 'timesteps')
+    ARRAYS = ('Fm', 'Cm', 'P')
+    __slots__ = ('data',) + SCALARS + ARRAYS
+
+    ## data: flat float64 array in the layout above, kept without copying
+    def __init__(self, data):
+        data = np.asarray(data, dtype=np.float64).reshape(-1)
+        if data.flags.writeable:
+            data = data.view()
+            data.flags.writeable = False
+        M = int(data[0])
+        if len(data) != 1+len(self.SCALARS)+M*len(self.ARRAYS):
+            raise ValueError('size of the data does not match its header.')
+        object.__setattr__(self, 'data', data)
+        for i, name in enumerate(self.SCALARS):
+            object.__setattr__(self, name, float(data[1+i]))
+        object.__setattr__(self, 'timesteps', int(self.timesteps))
+        offset = 1+len(self.SCALARS)
+        for name in self.ARRAYS:
+            object.__setattr__(self, name, data[offset:(offset+M)])
+            offset += M
+
+    ## pack the fields into one array, arrays of length M
+    @classmethod
+    def pack(cls, **fields):
+        M = len(fields['P'])
+        data = np.empty(1+len(cls.SCALARS)+M*len(cls.ARRAYS))
+        data[0] = M
+        for i, name in enumerate(cls.SCALARS):
+            data[1+i] = fields[name]
+        offset = 1+len(cls.SCALARS)
+        for name in cls.ARRAYS:
+            data[offset:(offset+M)] = fields[name]
+            offset += M
+        return cls(data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SABRDensityResult is immutable.')
+
+    def __delattr__(self, name):
+        raise AttributeError('SABRDensityResult is immutable.')
+
+    def __reduce__(self):
+        return (type(self).from_buffer, (self.to_bytes(),))
+
+    @property
+    def Fm_shifted(self):
+        return self.Fm-self.shift
+
+    @property
+    def probability_density(self):
+        return self.P/self.Cm
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def to_bytes(self):
+        return self.data.tobytes()
+
+    ## result viewing buffer (bytes, memoryview, shared memory, mmap, ...)
+    ## at offset bytes without copying
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        header = np.frombuffer(buffer, dtype=np.float64, count=1+len(cls.SCALARS), offset=offset)
+        count = 1+len(cls.SCALARS)+int(header[0])*len(cls.ARRAYS)
+        return cls(np.frombuffer(buffer, dtype=np.float64, count=count, offset=offset))
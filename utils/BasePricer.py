@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.interpolate import make_smoothing_spline
 import QuantLib as ql
 
 class BasePricer:
@@ -13,14 +18,27 @@ class BasePricer:
         self.engine = None
         self.pricer= None
         self.option = None
+        # least recently used instruments beyond max_instruments are dropped
+        # and stop observing the quotes
+        self.max_instruments = 256
+        self.instruments = OrderedDict()
+        self.engines = {}
 
     def set_params(self, **params):
         self.params = params
-        self.handles = {
-            key: ql.QuoteHandle(ql.SimpleQuote(item))
+        self.quotes = {
+            key: ql.SimpleQuote(item)
                 for (key, item) in zip(params.keys(), params.values())
         }
+        self.handles = {
+            key: ql.QuoteHandle(quote) for (key, quote) in self.quotes.items()
+        }
         self.set_termstructure()
+        # the pooled objects observe the previous quotes
+        self.process = None
+        self.model = None
+        self.instruments = OrderedDict()
+        self.engines = {}
 
     def set_termstructure(self):
         if self.params.get('risk_free_rate') is not None:
@@ -38,64 +56,158 @@ class BasePricer:
                 ql.BlackConstantVol(self.base_date, self.calendar,
                                     self.handles['volatility'], self.day_counter))
 
+    ## move the quotes of set_params to new values, the handles, term
+    ## structures, process, instruments and engines being kept and revalued
+    ## by QuantLib on the next NPV
+    def update_params(self, **changes):
+        for key in changes:
+            if key not in self.quotes:
+                print('Unknown parameter was selected.')
+                return
+
+        for (key, item) in changes.items():
+            self.params[key] = item
+            self.quotes[key].setValue(item)
+        self.update_process(changes.keys())
+
+    ## hook for the parameters which the process or the engines hold by value
+    ## rather than through self.handles
+    def update_process(self, keys):
+        pass
+
     def set_process(self):
         pass
 
+    def get_process(self):
+        if self.process is None:
+            self.set_process()
+        return self.process
+
     def vanilla_option_helper(self, strike, maturity_period, option_type):
-        self.set_process()
+        self.get_process()
         payoff = ql.PlainVanillaPayoff(option_type, strike)
         self.exercise_date = ql.EuropeanExercise(self.calendar.advance(
             self.base_date, maturity_period, ql.ModifiedFollowing, False))
         option = ql.VanillaOption(payoff, self.exercise_date)
         return option
 
+    ## pooled option priced by the pooled engine of method, both bound to
+    ## self.handles, so that they are reused across calls and revalued by
+    ## QuantLib when the quotes change
+    ## method: name of the engine
+    ## func_engine: builds the engine from engine_args on the first call
+    ## engine_args: arguments of func_engine, part of the keys of the pools
+    ## at most max_instruments options are kept, the least recently used
+    ## ones being dropped, e.g. after pricing a fine strike grid
+    def pooled_vanilla_option(self, strike, maturity_period, option_type,
+                              method, func_engine, *engine_args):
+        maturity_date = self.calendar.advance(
+            self.base_date, maturity_period, ql.ModifiedFollowing, False)
+        key = (float(strike), maturity_date.serialNumber(), option_type,
+               method) + engine_args
+        option = self.instruments.get(key)
+        if option is not None:
+            self.instruments.move_to_end(key)
+        else:
+            option = self.vanilla_option_helper(
+                strike, maturity_period, option_type)
+            engine_key = (method,) + engine_args
+            if engine_key not in self.engines:
+                self.engines[engine_key] = func_engine(*engine_args)
+            option.setPricingEngine(self.engines[engine_key])
+            self.instruments[key] = option
+            while len(self.instruments) > self.max_instruments:
+                self.instruments.popitem(last=False)
+        self.option = option
+        self.engine = self.engines[(method,) + engine_args]
+        return option
+
     def get_vanilla_option_price_analytic(self, strike, maturity_period,
                                           option_type=ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.engine = ql.AnalyticEuropeanEngine(self.process)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'analytic',
+            lambda: ql.AnalyticEuropeanEngine(self.process)).NPV()
 
     def get_vanilla_option_price_binomialtree(
         self, strike, maturity_period, steps, option_type=ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.engine = ql.BinomialVanillaEngine(self.process, 'crr', steps)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'binomialtree',
+            lambda steps: ql.BinomialVanillaEngine(self.process, 'crr', steps),
+            steps).NPV()
 
     def get_vanilla_option_price_fd(
         self, strike, maturity_period, timeSteps,
         gridPoints, option_type = ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.engine = ql.FDEuropeanEngine(
-            self.process, timeSteps=timeSteps, gridPoints=gridPoints)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'fd',
+            lambda timeSteps, gridPoints: ql.FdBlackScholesVanillaEngine(
+                self.process, timeSteps, gridPoints),
+            timeSteps, gridPoints).NPV()
 
     def get_vanilla_option_price_mc_pseudo(
         self, strike, maturity_period, timeSteps, requiredSamples,
         option_type = ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.engine = ql.MCEuropeanEngine(
-            self.process, 'PseudoRandom',
-            timeSteps=timeSteps, requiredSamples=requiredSamples)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'mc_pseudo',
+            lambda timeSteps, requiredSamples: ql.MCEuropeanEngine(
+                self.process, 'PseudoRandom',
+                timeSteps=timeSteps, requiredSamples=requiredSamples),
+            timeSteps, requiredSamples).NPV()
 
     def get_vanilla_option_price_mc_quasi(
         self, strike, maturity_period, timeSteps, requiredSamples,
         option_type = ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.engine = ql.MCEuropeanEngine(
-            self.process, 'LowDiscrepancy',
-            timeSteps=timeSteps, requiredSamples=requiredSamples)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'mc_quasi',
+            lambda timeSteps, requiredSamples: ql.MCEuropeanEngine(
+                self.process, 'LowDiscrepancy',
+                timeSteps=timeSteps, requiredSamples=requiredSamples),
+            timeSteps, requiredSamples).NPV()
+
+    ## prices of the strikes of one maturity by the vectorized
+    ## get_vanilla_option_prices_ method if the pricer has one, or else
+    ## strike by strike, None for an unknown method
+    def price_strip(self, strikes, maturity_period, method, **kargs):
+        strip_function = getattr(self, 'get_vanilla_option_prices_' + method, None)
+        if strip_function is not None:
+            return np.asarray(strip_function(strikes, maturity_period, **kargs))
+        npv_function = getattr(self, 'get_vanilla_option_price_' + method, None)
+        if npv_function is None:
+            return
+        return np.array([
+            npv_function(strike, maturity_period, **kargs) for strike in strikes
+        ])
+
+    ## prices of all strikes and maturities as array of shape
+    ## (len(maturities), len(strikes)), the process, model and engines being
+    ## built once and shared through the pools
+    ## method: suffix of a get_vanilla_option_price_ or vectorized
+    ##         get_vanilla_option_prices_ method, e.g. 'analytic'
+    ## workers: number of worker processes, each pricing whole maturities on
+    ##          its own copy of the pricer, None for os.cpu_count(), 1 to run
+    ##          in this process
+    ## kargs: additional arguments of the pricing method
+    def price_grid(self, strikes, maturities, method='analytic', workers=1,
+                   **kargs):
+        if not any(hasattr(self, prefix + method) for prefix in (
+            'get_vanilla_option_price_', 'get_vanilla_option_prices_')):
+            print('Unknown method was selected.')
+            return
+
+        if workers == 1:
+            return np.array([
+                self.price_strip(strikes, maturity_period, method, **kargs)
+                for maturity_period in maturities
+            ])
+
+        # QuantLib objects are not picklable, the workers rebuild the pricer
+        n = len(maturities)
+        periods = [(period.length(), period.units()) for period in maturities]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            rows = executor.map(
+                price_grid_row, [type(self)]*n, [self.params]*n,
+                [list(strikes)]*n, periods, [method]*n, [kargs]*n)
+            return np.array(list(rows))
 
     def get_digital_option_price(
         self, npv_function, strike, option_type=ql.Option.Call,
@@ -103,7 +215,7 @@ class BasePricer:
         kl = strike - 0.5*gap
         kr = kl + gap
         return (
-            npv_function(strike=kl, option_type=option_type, **params) /
+            npv_function(strike=kl, option_type=option_type, **params)
                 - npv_function(strike=kr, option_type=option_type, **params)
             ) * discount / gap
 
@@ -119,6 +231,45 @@ class BasePricer:
             option_type=ql.Option.Call, **params)
         return (npv_left - npv_right) * discount / gap
 
+    ## implied density on the whole strike grid from the calls of one strip
+    ## strikes: increasing strikes, dense enough to resolve the density
+    ## method: suffix of a get_vanilla_option_price_ method, see price_grid
+    ## scheme: 'differences' for the second differences of the calls on the
+    ##         (possibly nonuniform) grid, nan at both ends, or 'spline' for the
+    ##         second derivative of a smoothing spline of the calls, robust to
+    ##         the noise of numerical engines
+    ## lam: smoothing parameter of the spline, None for generalized cross
+    ##      validation
+    ## kargs: additional arguments of the pricing method
+    ## the calls come from one call of a vectorized get_vanilla_option_prices_
+    ## method where the pricer has one (e.g. cos, fft); the QuantLib engines
+    ## (fd, binomialtree, mc_*) still price strike by strike, one solve each,
+    ## as their solution grid is not exposed
+    def get_implied_density_curve(
+        self, strikes, maturity_period, method='analytic', discount=1.0,
+        scheme='differences', lam=None, **kargs):
+        if scheme not in ('differences', 'spline'):
+            print('Unknown scheme was selected.')
+            return
+
+        strikes = np.asarray(strikes, dtype=float)
+        calls = self.price_grid(
+            strikes, [maturity_period], method, option_type=ql.Option.Call,
+            **kargs)
+        if calls is None:
+            return
+        calls = calls[0]
+        if scheme == 'spline':
+            spline = make_smoothing_spline(strikes, calls, lam=lam)
+            return spline.derivative(2)(strikes) * discount
+
+        hl = strikes[1:-1] - strikes[:-2]
+        hr = strikes[2:] - strikes[1:-1]
+        density = np.full(len(strikes), np.nan)
+        density[1:-1] = 2 * (hr*calls[:-2] - (hl+hr)*calls[1:-1] + hl*calls[2:]) \
+            / (hl*hr*(hl+hr))
+        return density * discount
+
     def get_implied_volatility(
         self, npv, strike, maturity_period, discount=1.0):
         exercise = ql.EuropeanExercise(
@@ -127,3 +278,10 @@ class BasePricer:
         option = ql.EuropeanOption(payoff, exercise)
         return option.impliedVolatility(npv)
 
+## one maturity of BasePricer.price_grid in a worker process
+## pricer_class: class of the pricer, rebuilt from params
+## period: (length, units) of the maturity period
+def price_grid_row(pricer_class, params, strikes, period, method, kargs):
+    pricer = pricer_class()
+    pricer.set_params(**params)
+    return pricer.price_strip(strikes, ql.Period(*period), method, **kargs)
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 from BasePricer import BasePricer
+import time
 import QuantLib as ql
 import numpy as np
 import matplotlib.pyplot as plt
+from utils import func_characteristic_heston
+from utils import func_getCallPriceCurveByCarrMadan
+from utils import func_getCOSCoefficients, func_getPutPricesByCOS
 
 
 def my_plot(title, xlabel, ylabel, xdata, ydata, labels,
@@ -33,6 +37,7 @@ def my_plot(title, xlabel, ylabel, xdata, ydata, labels,
 class HestonPricer(BasePricer):
     def __init__(self):
         super().__init__()
+        self.characteristic_cache = {}
 
     def set_process(self):
         self.process = ql.HestonProcess(
@@ -40,24 +45,122 @@ class HestonPricer(BasePricer):
             self.handles['initS'], self.handles['initV'].value(),
             self.handles['kappa'].value(), self.handles['theta'].value(),
             self.handles['sigma'].value(), self.handles['rho'].value())
+        self.model = ql.HestonModel(self.process)
+
+    def update_process(self, keys):
+        # the Heston parameters are held by value by the model, in the order
+        # of its arguments
+        if self.model is not None and any(
+            key in keys for key in ('initV', 'kappa', 'theta', 'sigma', 'rho')):
+            self.model.setParams(ql.Array([
+                self.params['theta'], self.params['kappa'],
+                self.params['sigma'], self.params['rho'], self.params['initV']
+            ]))
 
     def get_vanilla_option_price_analytic(self, strike, maturity_period,
                                           option_type = ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.model = ql.HestonModel(self.process)
-        self.engine = ql.AnalyticHestonEngine(self.model)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'analytic_heston',
+            lambda: ql.AnalyticHestonEngine(self.model)).NPV()
 
     def get_vanilla_option_price_fd(self, strike, maturity_period,
                                     option_type = ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.model = ql.HestonModel(self.process)
-        self.engine = ql.FdHestonVanillaEngine(self.model)
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'fd_heston',
+            lambda: ql.FdHestonVanillaEngine(self.model)).NPV()
+
+    ## year fraction, discount factors and arguments of
+    ## func_characteristic_heston of the maturity, on the term structures of
+    ## the QuantLib engines
+    def characteristic_arguments(self, maturity_period):
+        maturity_date = self.calendar.advance(
+            self.base_date, maturity_period, ql.ModifiedFollowing, False)
+        maturity = self.day_counter.yearFraction(self.base_date, maturity_date)
+        discount = self.risk_free_ts.discount(maturity_date)
+        dividend_discount = self.dividend_ts.discount(maturity_date)
+        kargs = {
+            'initS': self.params['initS'],
+            'riskFreeRate': -np.log(discount)/maturity,
+            'dividendRate': -np.log(dividend_discount)/maturity,
+            'initV': self.params['initV'], 'kappa': self.params['kappa'],
+            'theta': self.params['theta'], 'sigma': self.params['sigma'],
+            'rho': self.params['rho'], 'maturity': maturity
+        }
+        return maturity_date, discount, dividend_discount, kargs
+
+    ## integration nodes of a maturity, computed once for each set of
+    ## parameters and kept until the parameters change
+    ## func_nodes: builds the nodes from the characteristic arguments
+    def cached_nodes(self, method, maturity_period, func_nodes, *settings):
+        maturity_date, discount, dividend_discount, kargs = \
+            self.characteristic_arguments(maturity_period)
+        key = (method, maturity_date.serialNumber()) + settings
+        values = tuple(sorted(kargs.items()))
+        cached = self.characteristic_cache.get(key)
+        if cached is None or cached[0] != values:
+            cached = (values, func_nodes(discount, dividend_discount, kargs))
+            self.characteristic_cache[key] = cached
+        return discount, dividend_discount, cached[1]
+
+    ## prices of a strike strip by the COS method in one vectorized pass
+    ## n: number of cosine terms, None to double it from 64 until the last
+    ##    quarter of the coefficients is below tol (at most 2**16)
+    ## L: half width of the truncation range of log of underlying in
+    ##    sqrt(c2+sqrt(c4)) of its cumulants, which widens the range for the
+    ##    fat tails of high sigma and long maturities
+    ## tol: tolerance on the coefficients when n is None
+    def get_vanilla_option_prices_cos(self, strikes, maturity_period,
+                                      option_type=ql.Option.Call, n=None,
+                                      L=10, tol=1e-10):
+        def func_nodes(discount, dividend_discount, kargs):
+            # cumulants of log of underlying by central differences of the
+            # cumulant generating function log(phi(u)) at u = 0
+            h = 1e-2
+            logphi = np.log(func_characteristic_heston(
+                np.arange(-2, 3)*h, **kargs))
+            c1 = (logphi[3]-logphi[1]).imag/(2*h)
+            c2 = -(logphi[3]-2*logphi[2]+logphi[1]).real/h**2
+            c4 = (logphi[4]-4*logphi[3]+6*logphi[2]-4*logphi[1]+logphi[0]).real/h**4
+            a = c1-L*np.sqrt(c2+np.sqrt(max(c4, 0)))
+            b = c1+L*np.sqrt(c2+np.sqrt(max(c4, 0)))
+            terms = n if n is not None else 64
+            while True:
+                u, coefficients = func_getCOSCoefficients(
+                    func_characteristic_heston, a, b, terms, **kargs)
+                if n is not None or terms >= 2**16 or \
+                        np.max(np.abs(coefficients[-(terms//4):])) < tol:
+                    return u, coefficients, a, b
+                terms *= 2
+
+        discount, dividend_discount, (u, coefficients, a, b) = self.cached_nodes(
+            'cos', maturity_period, func_nodes, n, L, tol)
+        strikes = np.asarray(strikes, dtype=float)
+        puts = func_getPutPricesByCOS(u, coefficients, strikes, a, b, discount)
+        if option_type == ql.Option.Put:
+            return puts
+        return puts+self.params['initS']*dividend_discount-strikes*discount
+
+    ## prices of a strike strip by Carr-Madan FFT in one vectorized pass
+    ## n: number of FFT points
+    ## eta: spacing of integration grid
+    ## alpha: damping factor of call price in log strike
+    def get_vanilla_option_prices_fft(self, strikes, maturity_period,
+                                      option_type=ql.Option.Call, n=4096,
+                                      eta=0.25, alpha=1.5):
+        def func_nodes(discount, dividend_discount, kargs):
+            # log strike grid centred on the forward
+            center = np.log(kargs['initS']*dividend_discount/discount)
+            return func_getCallPriceCurveByCarrMadan(
+                func_characteristic_heston, center, discount, alpha, n, eta,
+                **kargs)
+
+        discount, dividend_discount, curve = self.cached_nodes(
+            'fft', maturity_period, func_nodes, n, eta, alpha)
+        strikes = np.asarray(strikes, dtype=float)
+        calls = curve(np.log(strikes))
+        if option_type == ql.Option.Call:
+            return calls
+        return calls-self.params['initS']*dividend_discount+strikes*discount
 
 
 if __name__  ==  '__main__':
@@ -68,16 +171,34 @@ if __name__  ==  '__main__':
         risk_free_rate = 0.05 * 0, dividend_rate = 0,
         kappa = 10, theta = 0.15 ** 1, sigma = 0.1, rho = -0.8)
     strike = initS
-    strikes = np.linspace(-300, 300, num=200) * 5e-01 + initS
+    strikes = np.linspace(1, 250, num=200)
     maturity_period = ql.Period("1Y")
     print('NPV(analytic)    = ',
           pricer.get_vanilla_option_price_analytic(strike, maturity_period))
 
-    dens = [
-        pricer.get_implied_density(
-            pricer.get_vanilla_option_price_analytic,
-            k, gap=1e-01,
-            maturity_period=maturity_period) for k in strikes
-    ]
+    # agreement of the vectorized pricers with AnalyticHestonEngine
+    strip = np.linspace(50, 200, 301)
+    for period in ['1M', '1Y', '5Y']:
+        start = time.time()
+        analytic = pricer.price_strip(strip, ql.Period(period), 'analytic')
+        elapsed = {'analytic': time.time()-start}
+        errors = {}
+        for method in ['cos', 'fft']:
+            for option_type in [ql.Option.Call, ql.Option.Put]:
+                start = time.time()
+                prices = pricer.price_strip(
+                    strip, ql.Period(period), method, option_type=option_type)
+                elapsed.setdefault(method, time.time()-start)
+                reference = analytic if option_type == ql.Option.Call else \
+                    analytic-initS+strip*pricer.risk_free_ts.discount(
+                        pricer.calendar.advance(pricer.base_date, ql.Period(period)))
+                errors[method] = max(errors.get(method, 0),
+                                     np.max(np.abs(prices-reference)))
+        print('{0}: '.format(period)+', '.join(
+            '{0} {1:.2e} in {2:.4f}[sec]'.format(
+                method, errors.get(method, 0), elapsed[method])
+            for method in elapsed))
+
+    dens = pricer.get_implied_density_curve(strikes, maturity_period)
     my_plot('Heston Density', 'strike', 'prob', [strikes], [dens], ['dens'])
 
@@ -7,6 +7,13 @@ class SABRPricer(BasePricer):
     def __init__(self):
         super().__init__()
 
+    def update_process(self, keys):
+        # FdSabrVanillaEngine holds the SABR parameters by value
+        if any(key in keys for key in ('initS', 'alpha', 'beta', 'nu', 'rho')):
+            for key in [key for key in self.instruments if key[3] == 'fd_sabr']:
+                del self.instruments[key]
+            self.engines.pop(('fd_sabr',), None)
+
     def get_vanilla_option_price_sabr(self, strike, maturity_period,
                                       use_noarbsabr=False,
                                       option_type=ql.Option.Call):
@@ -39,15 +46,13 @@ class SABRPricer(BasePricer):
 
     def get_vanilla_option_price_noarbSabr(
         self, strike, maturity_period, option_type=ql.Option.Call):
-        self.option = self.vanilla_option_helper(
-                strike, maturity_period, option_type)
-        self.engine = ql.FdSabrVanillaEngine(
-            self.handles['initS'].value(), self.handles['alpha'].value(),
-            self.handles['beta'].value(), self.handles['nu'].value(),
-            self.handles['rho'].value(), self.risk_free_ts
-        )
-        self.option.setPricingEngine(self.engine)
-        return self.option.NPV()
+        return self.pooled_vanilla_option(
+            strike, maturity_period, option_type, 'fd_sabr',
+            lambda: ql.FdSabrVanillaEngine(
+                self.handles['initS'].value(), self.handles['alpha'].value(),
+                self.handles['beta'].value(), self.handles['nu'].value(),
+                self.handles['rho'].value(), self.risk_free_ts
+            )).NPV()
 
 
 if __name__  ==  '__main__':
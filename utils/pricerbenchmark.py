@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+## ticks per second of repricing a strike strip on a stream of market moves,
+## rebuilding the QuantLib objects by set_params on every tick against moving
+## the existing quotes by update_params
+
+import time
+import numpy as np
+import QuantLib as ql
+from BlackScholesPricer import BlackScholesPricer
+from HestonPricer import HestonPricer
+
+## pricer: pricer whose set_params has been called
+## npv_function: name of the pricing method of pricer
+## ticks: list of dicts of changed parameters
+## strikes: strikes priced on every tick
+## mode: 'set_params' or 'update_params'
+## returns ticks per second and the last prices
+def run(pricer, npv_function, ticks, strikes, maturity_period, mode):
+    params = dict(pricer.params)
+    start = time.perf_counter()
+    for tick in ticks:
+        if mode == 'set_params':
+            params.update(tick)
+            pricer.set_params(**params)
+        else:
+            pricer.update_params(**tick)
+        prices = [
+            getattr(pricer, npv_function)(strike, maturity_period)
+            for strike in strikes
+        ]
+    return len(ticks)/(time.perf_counter()-start), prices
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    maturity_period = ql.Period('1Y')
+    strikes = np.linspace(80, 120, 9)
+    cases = {
+        'BlackScholesPricer': (
+            BlackScholesPricer,
+            dict(initS=100, volatility=0.2, risk_free_rate=0.01, dividend_rate=0),
+            lambda: {'initS': 100*np.exp(0.01*rng.standard_normal()),
+                     'volatility': 0.2+0.01*rng.standard_normal()},
+            1000),
+        'HestonPricer': (
+            HestonPricer,
+            dict(initS=100, initV=0.04, risk_free_rate=0.01, dividend_rate=0,
+                 kappa=1.5, theta=0.04, sigma=0.3, rho=-0.7),
+            lambda: {'initS': 100*np.exp(0.01*rng.standard_normal()),
+                     'initV': 0.04*np.exp(0.05*rng.standard_normal())},
+            300)
+    }
+    for name, (cls, params, func_tick, n) in cases.items():
+        ticks = [func_tick() for _ in range(n)]
+        results = {}
+        for mode in ['set_params', 'update_params']:
+            pricer = cls()
+            pricer.set_params(**params)
+            results[mode] = run(pricer, 'get_vanilla_option_price_analytic',
+                                ticks, strikes, maturity_period, mode)
+        print('{0}: {1:.0f} ticks/sec by set_params, {2:.0f} ticks/sec by '
+              'update_params, max price difference {3:.1e}'.format(
+                  name, results['set_params'][0], results['update_params'][0],
+                  np.max(np.abs(np.subtract(results['set_params'][1],
+                                            results['update_params'][1])))))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+## the standard errors of func_getPriceByMCVarianceReduction_gbm against the
+## spread of the prices over independent seeds
+
+import numpy as np
+import pytest
+from numpy import exp
+from utils import func_getCallPriceByBlackScholesFormula
+from utils_variancereduction import func_getPriceByMCVarianceReduction_gbm
+from utils_variancereduction import func_getImportanceDrift_gbm
+
+initS, riskFreeRate, dividendRate, volatility, maturity = 100, 0.03, 0.01, 0.25, 1.0
+
+def techniques(K):
+    drift = func_getImportanceDrift_gbm(
+        K, initS, riskFreeRate, dividendRate, volatility, maturity)
+    forward = initS * exp((riskFreeRate - dividendRate) * maturity)
+    return {
+        'plain': {},
+        'moment_matching': {'moment_matching': True},
+        'combined': {
+            'antithetic': True, 'control_strike': forward,
+            'moment_matching': True, 'drift': drift
+        }
+    }
+
+def price_over_seeds(K, settings, n=20000, seeds=200):
+    def func_payoff(x):
+        return np.maximum(x - K, 0)
+
+    return [
+        func_getPriceByMCVarianceReduction_gbm(
+            func_payoff, initS, riskFreeRate, dividendRate, volatility,
+            maturity, n, rng=seed, **settings)
+        for seed in range(seeds)
+    ]
+
+## the reported standard error matches the empirical standard deviation of
+## the prices, whose relative sampling error is about 5% over 200 seeds
+@pytest.mark.parametrize('K', [100, 150])
+@pytest.mark.parametrize('technique', ['plain', 'moment_matching', 'combined'])
+def test_standard_error_matches_spread_over_seeds(K, technique):
+    results = price_over_seeds(K, techniques(K)[technique])
+    prices = np.array([result['price'] for result in results])
+    errors = np.array([result['standard_error'] for result in results])
+    ratio = prices.std(ddof=1) / np.sqrt(np.mean(errors**2))
+    assert 0.8 < ratio < 1.25
+
+## moment matching is credited with the variance it removes
+def test_moment_matching_reduces_variance():
+    results = price_over_seeds(100, {'moment_matching': True}, seeds=20)
+    assert np.median([result['variance_reduction'] for result in results]) > 10
+
+## the confidence intervals cover the closed-form price at about their level
+def test_confidence_interval_coverage():
+    K = 100
+    exact = func_getCallPriceByBlackScholesFormula(
+        K, initS, riskFreeRate, dividendRate, volatility, maturity)
+    results = price_over_seeds(K, techniques(K)['combined'])
+    covered = np.mean([result['lower'] <= exact <= result['upper'] for result in results])
+    assert 0.9 < covered <= 1.0
@@ -1,11 +1,15 @@
 # -*- coding,  utf-8 -*-
+import os
 import sys
-from numpy import exp, log, sqrt
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from numpy import exp, log, sqrt, cos, sin
 from numpy import inf
 from scipy.stats import norm, lognorm
-from scipy.special import jv
+from scipy.special import jv, ndtr
 from scipy.integrate import quad
-from scipy.optimize import newton
+from scipy.interpolate import CubicSpline
 from scipy.optimize import brentq
 
 ## number of constant
@@ -77,6 +81,76 @@ def func_getPutPriceByBlackFormula(K, forward, riskFreeRate, volatility, maturit
     d2 = (log((forward + shift) / (K + shift)) - 0.5 * volatility ** 2 * maturity) / (volatility * sqrt(maturity))
     return exp(-riskFreeRate * maturity) * ((K + shift) * norm.cdf(-d2) - (forward + shift) * norm.cdf(-d1))
 
+## get call and put prices of Black formula on broadcast arrays
+## the prices are computed with one evaluation of d1 and d2 shared by the
+## call and the put and written into the output buffers
+## K: execution price (shifted)
+## forward: forward of underlying asset (shifted)
+## discount: discount factor
+## stdev: total standard deviation, volatility * sqrt(maturity)
+## call_out, put_out: optional arrays receiving the call and put prices
+def func_getCallPutPricesByBlackKernel(K, forward, discount, stdev, call_out=None, put_out=None):
+    shape = np.broadcast_shapes(np.shape(K), np.shape(forward), np.shape(discount), np.shape(stdev))
+    call = np.empty(shape) if call_out is None else call_out
+    put = np.empty(shape) if put_out is None else put_out
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = np.divide(forward, K, out=np.empty(shape))
+        np.log(d1, out=d1)
+        d1 /= stdev
+        d1 += 0.5 * stdev
+        d2 = np.subtract(d1, stdev, out=np.empty(shape))
+        # call = discount * (forward * N(d1) - K * N(d2))
+        ndtr(d1, out=call)
+        call *= forward
+        ndtr(d2, out=put)
+        put *= K
+        call -= put
+        call *= discount
+        # put = discount * (K * N(-d2) - forward * N(-d1))
+        np.negative(d2, out=d2)
+        ndtr(d2, out=put)
+        put *= K
+        np.negative(d1, out=d1)
+        ndtr(d1, out=d1)
+        d1 *= forward
+        put -= d1
+        put *= discount
+    # intrinsic values without volatility or time to maturity
+    expired = np.broadcast_to(np.asarray(stdev) == 0, shape)
+    if np.any(expired):
+        intrinsic = np.broadcast_to(discount * (forward - K), shape)[expired]
+        call[expired] = np.maximum(intrinsic, 0)
+        put[expired] = np.maximum(-intrinsic, 0)
+    return call, put
+
+## get call and put prices by Black-Scholes formula on broadcast arrays
+## K: execution price
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## call_out, put_out: optional arrays receiving the call and put prices
+def func_getCallPutPricesByBlackScholesFormula(K, initS, riskFreeRate, dividendRate, volatility, maturity, call_out=None, put_out=None):
+    forward = initS * exp((np.asarray(riskFreeRate) - dividendRate) * maturity)
+    return func_getCallPutPricesByBlackKernel(
+        K, forward, exp(-np.asarray(riskFreeRate) * maturity),
+        volatility * sqrt(maturity), call_out, put_out)
+
+## get call and put prices by Black formula on broadcast arrays
+## K: execution price
+## forward: initial forward of underlying asset
+## riskFreeRate: riskfree rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## shift: width of volatility shift
+## call_out, put_out: optional arrays receiving the call and put prices
+def func_getCallPutPricesByBlackFormula(K, forward, riskFreeRate, volatility, maturity, shift=0, call_out=None, put_out=None):
+    return func_getCallPutPricesByBlackKernel(
+        np.asarray(K) + shift, np.asarray(forward) + shift,
+        exp(-np.asarray(riskFreeRate) * maturity),
+        volatility * sqrt(maturity), call_out, put_out)
+
 ## get terminal value of Geometric Brownian Motion by monte carlo simulation
 ## initS: initial value of underlying asset
 ## riskFreeRate: riskfree rate
@@ -84,9 +158,145 @@ def func_getPutPriceByBlackFormula(K, forward, riskFreeRate, volatility, maturit
 ## volatility: volatility of underlying asset
 ## maturity: term to maturity in year basis
 ## n: the number of path in simulation
-def func_getTerminalValueByMC_gbm(initS, riskFreeRate, dividendRate, volatility, maturity, n):
+## rng: numpy.random.Generator, None for scipy.stats.norm
+## out: optional array of size n receiving the terminal values
+def func_getTerminalValueByMC_gbm(initS, riskFreeRate, dividendRate, volatility, maturity, n, rng=None, out=None):
     mu = riskFreeRate - dividendRate
-    return initS * exp((mu - 0.5 * volatility ** 2) * maturity + volatility * sqrt(maturity) * norm.rvs(size=n))
+    if rng is None:
+        return initS * exp((mu - 0.5 * volatility ** 2) * maturity + volatility * sqrt(maturity) * norm.rvs(size=n))
+    x = rng.standard_normal(n, out=out)
+    x *= volatility * sqrt(maturity)
+    x += (mu - 0.5 * volatility ** 2) * maturity
+    np.exp(x, out=x)
+    x *= initS
+    return x
+
+## running count, mean and sum of squared deviations of samples, updated
+## chunk by chunk with the pairwise form of Welford's algorithm so that
+## partial statistics are merged exactly
+class RunningStatistics:
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def merge(self, other):
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        return self
+
+    def add(self, values):
+        mean = values.mean()
+        return self.merge(RunningStatistics(len(values), mean, np.square(values - mean).sum()))
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def standard_error(self):
+        return sqrt(self.variance / self.count) if self.count > 1 else np.nan
+
+## get option price by monte carlo simulation of Geometric Brownian Motion
+## streamed in chunks, without holding all paths in memory
+## func_payoff: payoff of terminal values, vectorized
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## n: the maximum number of path in simulation
+## chunk: the number of path per chunk
+## target_error: standard error of price to stop at, None to simulate n paths
+## confidence: level of confidence interval
+## rng: numpy.random.Generator or seed
+## returns dict of price, standard error, bounds of confidence interval,
+## number of paths and running statistics of the discounted payoffs
+def func_getPriceByMC_gbm(func_payoff, initS, riskFreeRate, dividendRate, volatility, maturity, n, chunk=2**16, target_error=None, confidence=0.95, rng=None):
+    rng = np.random.default_rng(rng)
+    discount = exp(-riskFreeRate * maturity)
+    statistics = RunningStatistics()
+    buffer = np.empty(min(chunk, n))
+    while statistics.count < n:
+        m = min(chunk, n - statistics.count)
+        x = func_getTerminalValueByMC_gbm(
+            initS, riskFreeRate, dividendRate, volatility, maturity, m, rng, buffer[:m])
+        statistics.add(discount * func_payoff(x))
+        if target_error is not None and statistics.standard_error <= target_error:
+            break
+    return func_getMCResult(statistics, confidence)
+
+## simulate one block of paths of func_getPriceByMCParallel_gbm
+## seed: numpy.random.SeedSequence of the block
+## returns running statistics of the discounted payoffs, elapsed time and
+## process id
+def func_simulateBlock_gbm(func_payoff, initS, riskFreeRate, dividendRate, volatility, maturity, n, chunk, seed):
+    start = time.perf_counter()
+    result = func_getPriceByMC_gbm(
+        func_payoff, initS, riskFreeRate, dividendRate, volatility, maturity,
+        n, chunk, rng=np.random.default_rng(seed))
+    return result['statistics'], time.perf_counter() - start, os.getpid()
+
+## get option price by monte carlo simulation of Geometric Brownian Motion
+## in a pool of worker processes
+## the paths are split into a fixed number of blocks, each with its own
+## random stream spawned from one SeedSequence, and the block statistics are
+## merged in block order, so the result does not depend on the workers
+## func_payoff: payoff of terminal values, vectorized and picklable
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## n: the number of path in simulation
+## seed: entropy of the root SeedSequence
+## blocks: the number of blocks of paths
+## workers: number of worker processes, None for os.cpu_count(), 1 to run
+##          in this process
+## chunk: the number of path per chunk
+## confidence: level of confidence interval
+## returns dict of func_getMCResult with the paths per second of each worker
+def func_getPriceByMCParallel_gbm(func_payoff, initS, riskFreeRate, dividendRate, volatility, maturity, n, seed=None, blocks=64, workers=None, chunk=2**16, confidence=0.95):
+    seeds = np.random.SeedSequence(seed).spawn(blocks)
+    sizes = [n // blocks + (1 if i < n % blocks else 0) for i in range(blocks)]
+    args = [
+        [func_payoff] * blocks, [initS] * blocks, [riskFreeRate] * blocks,
+        [dividendRate] * blocks, [volatility] * blocks, [maturity] * blocks,
+        sizes, [chunk] * blocks, seeds
+    ]
+    if workers == 1:
+        blocks = list(map(func_simulateBlock_gbm, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            blocks = list(executor.map(func_simulateBlock_gbm, *args))
+
+    statistics = RunningStatistics()
+    elapsed = {}
+    paths = {}
+    for (block, seconds, pid), size in zip(blocks, sizes):
+        statistics.merge(block)
+        elapsed[pid] = elapsed.get(pid, 0) + seconds
+        paths[pid] = paths.get(pid, 0) + size
+    result = func_getMCResult(statistics, confidence)
+    result['throughput'] = {pid: paths[pid] / elapsed[pid] for pid in paths}
+    return result
+
+## get price and confidence interval of running statistics of discounted payoffs
+def func_getMCResult(statistics, confidence=0.95):
+    width = norm.ppf(0.5 + 0.5 * confidence) * statistics.standard_error
+    return {
+        'price': statistics.mean,
+        'standard_error': statistics.standard_error,
+        'lower': statistics.mean - width,
+        'upper': statistics.mean + width,
+        'paths': statistics.count,
+        'statistics': statistics
+    }
 
 ## get probability density of Geometric Brownian Motion
 ## initS: initial value of underlying asset
@@ -117,6 +327,40 @@ def func_density_cev(x, initS, riskFreeRate, dividendRate, volatility, beta, mat
     return \
         (2-beta)*k**(1/(2-beta))*(m*w**(1-2*beta))**(1/(4-2*beta))*exp(-m-w)*jv(1/(2-beta), 2*sqrt(m*w))
 
+## get characteristic function of log of Geometric Brownian Motion
+## u: argument of characteristic function, complex allowed
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+def func_characteristic_gbm(u, initS, riskFreeRate, dividendRate, volatility, maturity):
+    mu = log(initS) + (riskFreeRate - dividendRate - 0.5 * volatility**2) * maturity
+    return exp(1j * u * mu - 0.5 * volatility**2 * maturity * u**2)
+
+## get characteristic function of log of Heston process
+## the "little trap" form of Albrecher et al., continuous in u
+## u: argument of characteristic function, complex allowed
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## initV: initial variance
+## kappa: speed of mean reversion of variance
+## theta: long-run variance
+## sigma: volatility of variance
+## rho: correlation of underlying and variance
+## maturity: term to maturity in year basis
+def func_characteristic_heston(u, initS, riskFreeRate, dividendRate, initV, kappa, theta, sigma, rho, maturity):
+    u = np.asarray(u, dtype=complex)
+    beta = kappa - 1j * rho * sigma * u
+    d = np.sqrt(beta**2 + sigma**2 * (1j * u + u**2))
+    g = (beta - d) / (beta + d)
+    edt = exp(-d * maturity)
+    C = 1j * u * (log(initS) + (riskFreeRate - dividendRate) * maturity) \
+        + kappa * theta / sigma**2 * ((beta - d) * maturity - 2 * log((1 - g * edt) / (1 - g)))
+    D = (beta - d) / sigma**2 * (1 - edt) / (1 - g * edt)
+    return exp(C + D * initV)
+
 ## get call price by integration
 ## func_density: density function of underlying
 ## K: execution price
@@ -145,20 +389,258 @@ def func_getPutPriceByIntegration(func_density, K, lower=-inf, upper=inf, discou
 
     return discount * quad(func_integrand, a=lower, b=upper, epsrel=CONST_TOLERANCE_INTEGRATION)[0]
 
+## get nodes and weights of quadrature rule on [-1, 1]
+## n: number of nodes
+## rule: 'gauss_legendre' or 'tanh_sinh', the latter being robust to
+##       integrable singularities of the density at the ends of the panels
+def func_getQuadratureNodes(n, rule='gauss_legendre'):
+    if rule == 'gauss_legendre':
+        return np.polynomial.legendre.leggauss(n)
+    elif rule == 'tanh_sinh':
+        h = 6.0 / (n - 1)
+        t = np.linspace(-3, 3, n)
+        u = 0.5 * np.pi * np.sinh(t)
+        return np.tanh(u), h * 0.5 * np.pi * np.cosh(t) / np.cosh(u)**2
+    else:
+        print('Unknown quadrature rule was selected.')
+        return
+
+## get call and put prices of strike strip by integration
+## the density is evaluated once on the quadrature nodes of panels whose
+## edges contain all strikes, and every strike is priced from the cumulative
+## sums of the zeroth and first moments of the panels
+## func_density: density function of underlying, vectorized in x
+## K: execution prices
+## lower: lower bound of integration, finite
+## upper: upper bound of integration, finite
+## discount: discount factor in some numeraire
+## gearing: gearing
+## panels: number of uniform panels before the strikes are inserted
+## nodes: number of quadrature nodes per panel
+## rule: quadrature rule of func_getQuadratureNodes
+## kargs: additional arguments of func.density
+def func_getCallPutPricesByIntegration(func_density, K, lower, upper, discount=1, gearing=1, panels=64, nodes=16, rule='gauss_legendre', **kargs):
+    tmp = func_getQuadratureNodes(nodes, rule)
+    if tmp is None:
+        return
+    x, w = tmp
+    K = np.asarray(K, dtype=float)
+    kinks = np.clip(K / gearing, lower, upper)
+    edges = np.unique(np.concatenate([np.linspace(lower, upper, panels + 1), kinks.ravel()]))
+    half = 0.5 * np.diff(edges)[:, None]
+    xs = edges[:-1, None] + half * (1 + x)
+    ps = func_density(x=xs, **kargs) * (half * w)
+    m0 = np.concatenate([[0], np.cumsum(ps.sum(axis=1))])
+    m1 = np.concatenate([[0], np.cumsum((ps * xs).sum(axis=1))])
+    index = np.searchsorted(edges, kinks)
+    # moments below and above each kink
+    put = discount * (K * m0[index] - gearing * m1[index])
+    call = discount * (gearing * (m1[-1] - m1[index]) - K * (m0[-1] - m0[index]))
+    return call, put
+
+## get call prices by Carr-Madan FFT as spline in log strike
+## "Option valuation using the fast Fourier transform"
+## func_cf: characteristic function of log of underlying, vectorized in u
+## center: centre of the grid of log strikes
+## discount: discount factor in some numeraire
+## alpha: damping factor of call price in log strike
+## n: number of FFT points
+## eta: spacing of integration grid
+## kargs: additional arguments of func_cf
+def func_getCallPriceCurveByCarrMadan(func_cf, center, discount=1, alpha=1.5, n=4096, eta=0.25, **kargs):
+    j = np.arange(n)
+    v = eta * j
+    lam = 2 * np.pi / (n * eta)
+    k0 = center - 0.5 * n * lam
+    psi = discount * func_cf(v - (alpha + 1) * 1j, **kargs) \
+        / (alpha**2 + alpha - v**2 + 1j * (2 * alpha + 1) * v)
+    simpson = eta / 3 * (3 + (-1.0)**(j + 1) - (j == 0))
+    y = np.fft.fft(exp(-1j * v * k0) * psi * simpson).real
+    k = k0 + lam * j
+    return CubicSpline(k, exp(-alpha * k) / np.pi * y)
+
+## get call prices of strike strip by Carr-Madan FFT
+## func_cf: characteristic function of log of underlying, vectorized in u
+## K: execution prices
+## discount: discount factor in some numeraire
+## alpha: damping factor of call price in log strike
+## n: number of FFT points
+## eta: spacing of integration grid
+## kargs: additional arguments of func_cf
+def func_getCallPricesByCarrMadan(func_cf, K, discount=1, alpha=1.5, n=4096, eta=0.25, **kargs):
+    K = np.asarray(K, dtype=float)
+    # log strike grid centred on the strikes
+    center = 0.5 * (log(K.min()) + log(K.max()))
+    return func_getCallPriceCurveByCarrMadan(
+        func_cf, center, discount, alpha, n, eta, **kargs)(log(K))
+
+## get coefficients of the COS method, the characteristic function at the
+## nodes u_k = k pi / (b - a) shifted to the left end a of the range
+## "A novel pricing method for European options based on Fourier-cosine
+## series expansions"
+## func_cf: characteristic function of log of underlying, vectorized in u
+## a, b: truncation range of log of underlying
+## n: number of cosine terms
+## kargs: additional arguments of func_cf
+## returns nodes and coefficients, the first one halved
+def func_getCOSCoefficients(func_cf, a, b, n=256, **kargs):
+    u = np.arange(n) * np.pi / (b - a)
+    coefficients = (func_cf(u, **kargs) * exp(-1j * u * a)).real
+    coefficients[0] *= 0.5
+    return u, coefficients
+
+## get put prices of strike strip by the COS method
+## the puts, bounded payoffs, are priced and the calls follow by parity
+## nodes, coefficients: output of func_getCOSCoefficients
+## K: execution prices, the payoffs being truncated to [a, b] as well
+## a, b: truncation range of log of underlying
+## discount: discount factor in some numeraire
+def func_getPutPricesByCOS(nodes, coefficients, K, a, b, discount=1):
+    K = np.asarray(K, dtype=float)
+    c = a
+    d = np.clip(log(K), a, b)[..., None]
+    u = nodes
+    # chi: integral of exp(x) cos(u (x - a)) and psi: of cos(u (x - a)) on [c, d]
+    chi = (cos(u * (d - a)) * exp(d) - cos(u * (c - a)) * exp(c)
+           + u * sin(u * (d - a)) * exp(d) - u * sin(u * (c - a)) * exp(c)) \
+        / (1 + u**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        psi = np.where(u > 0, (sin(u * (d - a)) - sin(u * (c - a))) / u, d - c)
+    payoff = 2 / (b - a) * (K[..., None] * psi - chi)
+    return discount * (payoff @ coefficients)
+
+## bracketed Newton iterations on the log of out-of-the-money premiums in
+## the total standard deviation s, vectorized over all options
+## the bracket [lo, hi] is narrowed by the sign of the residual and a step
+## leaving it is replaced by bisection (or doubling while hi is infinite)
+## func: returns the premiums and vegas in s of the options selected by index
+## target: out-of-the-money undiscounted premiums
+## guess: initial guess of s, nan for no solution
+## lo: lower bound of s
+## returns s and the mask of converged options
+def func_solveImpliedStandardDeviation(func, target, guess, lo, tol=CONST_TOLERANCE_OPTIMIZATION_ERROR, maxiter=100):
+    s = guess.copy()
+    lo = lo.copy()
+    hi = np.full(len(s), inf)
+    converged = np.zeros(len(s), dtype=bool)
+    active = np.flatnonzero(np.isfinite(s))
+    with np.errstate(all='ignore'):
+        logTarget = log(target)
+        for _ in range(maxiter):
+            if len(active) == 0:
+                break
+            sa = s[active]
+            value, vega = func(sa, active)
+            f = log(value) - logTarget[active]
+            hi[active] = np.where(f > 0, sa, hi[active])
+            lo[active] = np.where(f < 0, sa, lo[active])
+            update = sa - f * value / vega
+            done = (np.abs(update - sa) <= tol * sa) | (f == 0)
+            # a converged step may land on the bracket it has just moved
+            outside = ~((update > lo[active]) & (update < hi[active])) & ~done
+            update[outside] = np.where(
+                np.isfinite(hi[active][outside]),
+                0.5 * (lo[active][outside] + hi[active][outside]),
+                2 * sa[outside])
+            s[active] = update
+            converged[active[done]] = True
+            active = active[~done]
+    return s, converged
+
+## convert premiums to out-of-the-money undiscounted premiums
+## phi: 1 for calls, -1 for puts, None when the premiums are already out of
+##      the money (calls for K >= forward, puts otherwise)
+def func_getOutOfTheMoneyPremiums(premium, K, forward, riskFreeRate, maturity, phi=None):
+    premium = np.asarray(premium, dtype=float) * exp(riskFreeRate * maturity)
+    theta = np.where(K >= forward, 1.0, -1.0)
+    if phi is not None:
+        # put-call parity for in-the-money premiums
+        premium = premium - np.where(phi != theta, phi * (forward - K), 0)
+    return premium, theta
+
+## get implied shifted Black volatilities of arrays of premiums
+## premium: premiums of options
+## K: execution prices
+## forward: initial forward of underlying asset
+## riskFreeRate: riskfree rate
+## maturity: term to maturity in year basis
+## shift: width of volatility shift
+## phi: 1 for calls, -1 for puts, None for out-of-the-money premiums
+## returns volatilities and the mask of converged options, nan volatility
+## where the premium admits no volatility (outside of the no-arbitrage
+## bounds), the last iterate where the solver did not converge
+def func_getImpliedShiftedBlackVolatilities(premium, K, forward, riskFreeRate, maturity, shift=0, phi=None, tol=CONST_TOLERANCE_OPTIMIZATION_ERROR, maxiter=100):
+    premium, K, forward, maturity = np.broadcast_arrays(*[
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (premium, K, forward, maturity)])
+    shape = premium.shape
+    if phi is not None:
+        phi = np.broadcast_to(phi, shape).ravel()
+    target, theta = func_getOutOfTheMoneyPremiums(
+        premium.ravel(), K.ravel(), forward.ravel(), riskFreeRate, maturity.ravel(), phi)
+    F = forward.ravel() + shift
+    K = K.ravel() + shift
+    with np.errstate(all='ignore'):
+        x = log(F / K)
+        valid = (target > 0) & (target < np.minimum(F, K))
+        # Corrado-Miller approximation on the call premium, or the point of
+        # inflection sqrt(2|x|) of the premium when it breaks down
+        call = target + np.maximum(F - K, 0)
+        a = call - 0.5 * (F - K)
+        guess = sqrt(2 * np.pi) / (F + K) * (a + sqrt(np.maximum(a**2 - (F - K)**2 / np.pi, 0)))
+        guess = np.where(guess > 0, guess, sqrt(2 * np.abs(x)))
+    guess[~valid] = np.nan
+
+    def func(s, index):
+        d1 = x[index] / s + 0.5 * s
+        d2 = d1 - s
+        value = theta[index] * (F[index] * ndtr(theta[index] * d1) - K[index] * ndtr(theta[index] * d2))
+        return value, F[index] * exp(-0.5 * d1**2) / sqrt(2 * np.pi)
+
+    s, converged = func_solveImpliedStandardDeviation(
+        func, target, guess, np.zeros(len(target)), tol, maxiter)
+    return (s / sqrt(maturity.ravel())).reshape(shape), converged.reshape(shape)
+
+## get implied normal volatilities of arrays of premiums
+## premium: premiums of options
+## K: execution prices
+## forward: initial forward of underlying asset
+## riskFreeRate: riskfree rate
+## maturity: term to maturity in year basis
+## phi: 1 for calls, -1 for puts, None for out-of-the-money premiums
+## returns volatilities and the mask of converged options, nan volatility
+## where the premium admits no volatility (outside of the no-arbitrage
+## bounds), the last iterate where the solver did not converge
+def func_getImpliedNormalVolatilities(premium, K, forward, riskFreeRate, maturity, phi=None, tol=CONST_TOLERANCE_OPTIMIZATION_ERROR, maxiter=100):
+    premium, K, forward, maturity = np.broadcast_arrays(*[
+        np.atleast_1d(np.asarray(x, dtype=float)) for x in (premium, K, forward, maturity)])
+    shape = premium.shape
+    if phi is not None:
+        phi = np.broadcast_to(phi, shape).ravel()
+    target, theta = func_getOutOfTheMoneyPremiums(
+        premium.ravel(), K.ravel(), forward.ravel(), riskFreeRate, maturity.ravel(), phi)
+    x = forward.ravel() - K.ravel()
+    # the at-the-money premium bounds s from below
+    lo = sqrt(2 * np.pi) * np.maximum(target, 0)
+    guess = np.where(target > 0, np.maximum(lo, np.abs(x)), np.nan)
+
+    def func(s, index):
+        d = x[index] / s
+        vega = exp(-0.5 * d**2) / sqrt(2 * np.pi)
+        return theta[index] * x[index] * ndtr(theta[index] * d) + s * vega, vega
+
+    s, converged = func_solveImpliedStandardDeviation(
+        func, target, guess, lo, tol, maxiter)
+    return (s / sqrt(maturity.ravel())).reshape(shape), converged.reshape(shape)
+
 ## get implied shifted Black volatility
+## premium: out-of-the-money premium, of call for forward <= K and of put otherwise
 ## K: execution price
 ## forward: initial forward of underlying asset
 ## riskFreeRate: riskfree rate
 ## maturity: term to maturity in year basis
 ## shift: width of volatility shift
+## returns nan when the solver does not converge
 def func_getImpliedShiftedBlackVolatility(premium, K, forward, riskFreeRate, maturity, shift=0):
-    def f(x):
-        if forward <= K:
-            calculated_premium = func_getCallPriceByBlackFormula(K, forward, riskFreeRate, x, maturity, shift)
-        else:
-            calculated_premium = func_getPutPriceByBlackFormula(K, forward, riskFreeRate, x, maturity, shift)
-        return premium - calculated_premium
-
-    return newton(f, 0.5, tol=CONST_TOLERANCE_OPTIMIZATION_ERROR)
-    # return brentq(f, 1e-08, 5, rtol=CONST_TOLERANCE_OPTIMIZATION_ERROR)
-
+    volatility, converged = func_getImpliedShiftedBlackVolatilities(
+        premium, K, forward, riskFreeRate, maturity, shift)
+    return volatility[0] if converged[0] else np.nan
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+## premiums and first and second order Greeks of the Black-Scholes and the
+## (shifted) Black formula on broadcast arrays, all Greeks of an option come
+## from one evaluation of d1, d2, the normal density and the normal cdf
+
+import numpy as np
+from scipy.special import ndtr
+
+CONST_INV_SQRT_2PI = 1 / np.sqrt(2 * np.pi)
+
+## get premium and Greeks by Black-Scholes formula
+## K: execution price
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## phi: 1 for calls, -1 for puts, broadcast with the other arguments
+## returns dict of price, delta, gamma, vega, theta, rho, epsilon (sensitivity
+## to the dividend rate), vanna and volga, theta being per year of calendar time
+def func_getGreeksByBlackScholesFormula(K, initS, riskFreeRate, dividendRate, volatility, maturity, phi=1):
+    K, S, r, q, sigma, T, phi = np.broadcast_arrays(*[
+        np.asarray(x, dtype=float)
+        for x in (K, initS, riskFreeRate, dividendRate, volatility, maturity, phi)
+    ])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrtT = np.sqrt(T)
+        stdev = sigma * sqrtT
+        d1 = (np.log(S / K) + (r - q) * T) / stdev + 0.5 * stdev
+        d2 = d1 - stdev
+        dividendDiscount = np.exp(-q * T)
+        discount = np.exp(-r * T)
+        Sq = S * dividendDiscount
+        Kr = K * discount
+        n = CONST_INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+        Nd1 = ndtr(phi * d1)
+        Nd2 = ndtr(phi * d2)
+        vega = Sq * n * sqrtT
+        return {
+            'price': phi * (Sq * Nd1 - Kr * Nd2),
+            'delta': phi * dividendDiscount * Nd1,
+            'gamma': dividendDiscount * n / (S * stdev),
+            'vega': vega,
+            'theta': -0.5 * Sq * n * sigma / sqrtT + phi * (q * Sq * Nd1 - r * Kr * Nd2),
+            'rho': phi * T * Kr * Nd2,
+            'epsilon': -phi * T * Sq * Nd1,
+            'vanna': -dividendDiscount * n * d2 / sigma,
+            'volga': vega * d1 * d2 / sigma
+        }
+
+## get premium and Greeks by Black formula
+## K: execution price
+## forward: initial forward of underlying asset
+## riskFreeRate: riskfree rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## shift: width of volatility shift
+## phi: 1 for calls, -1 for puts, broadcast with the other arguments
+## returns dict of price, delta, gamma, vega, theta, rho, vanna and volga,
+## delta and gamma being in the forward and theta and rho holding the forward
+## fixed
+def func_getGreeksByBlackFormula(K, forward, riskFreeRate, volatility, maturity, shift=0, phi=1):
+    K, F, r, sigma, T, phi = np.broadcast_arrays(*[
+        np.asarray(x, dtype=float)
+        for x in (K, forward, riskFreeRate, volatility, maturity, phi)
+    ])
+    K = K + shift
+    F = F + shift
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrtT = np.sqrt(T)
+        stdev = sigma * sqrtT
+        d1 = np.log(F / K) / stdev + 0.5 * stdev
+        d2 = d1 - stdev
+        discount = np.exp(-r * T)
+        n = CONST_INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+        Nd1 = ndtr(phi * d1)
+        Nd2 = ndtr(phi * d2)
+        price = discount * phi * (F * Nd1 - K * Nd2)
+        vega = discount * F * n * sqrtT
+        return {
+            'price': price,
+            'delta': discount * phi * Nd1,
+            'gamma': discount * n / (F * stdev),
+            'vega': vega,
+            'theta': -0.5 * discount * F * n * sigma / sqrtT + r * price,
+            'rho': -T * price,
+            'vanna': -discount * n * d2 / sigma,
+            'volga': vega * d1 * d2 / sigma
+        }
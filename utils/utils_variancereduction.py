@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+## variance reduction of monte carlo pricing on Geometric Brownian Motion
+## antithetic variates, control variates on a call priced in closed form,
+## moment matching and importance sampling are switched on independently and
+## combined, the variance-reduction factor being measured against the plain
+## estimator on the same normal variates
+## moment-matched variates are not independent, so with moment matching the
+## standard error is estimated from independent batches instead of the
+## sample variance
+
+import numpy as np
+from numpy import exp, log, sqrt
+from scipy.stats import t as student_t
+from utils import func_getCallPriceByBlackScholesFormula
+from utils import RunningStatistics, func_getMCResult
+
+## get drift of the normal variates which moves the median of the terminal
+## value to strike, the importance sampling drift for an out-of-the-money call
+## K: execution price
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+def func_getImportanceDrift_gbm(K, initS, riskFreeRate, dividendRate, volatility, maturity):
+    mu = riskFreeRate - dividendRate - 0.5 * volatility**2
+    return max((log(K / initS) - mu * maturity) / (volatility * sqrt(maturity)), 0)
+
+## get option price by monte carlo simulation of Geometric Brownian Motion
+## with variance reduction
+## func_payoff: payoff of terminal values, vectorized
+## initS: initial value of underlying asset
+## riskFreeRate: riskfree rate
+## dividendRate: dividend rate
+## volatility: volatility of underlying asset
+## maturity: term to maturity in year basis
+## n: the number of payoff evaluations
+## antithetic: pair each normal variate z with -z
+## control_strike: strike of the call used as control variate, None for no
+##                 control variate
+## moment_matching: match the sample mean and variance of the normal
+##                  variates to 0 and 1 within each of the batches
+## drift: mean of the normal variates for importance sampling, 0 for none
+## rng: numpy.random.Generator or seed
+## confidence: level of confidence interval
+## batches: the number of independent batches whose means give the standard
+##          error and the Student t confidence interval when moment_matching
+## returns dict of func_getMCResult with the variance-reduction factor, the
+## ratio of the variances per payoff evaluation of the plain and the reduced
+## estimators
+def func_getPriceByMCVarianceReduction_gbm(func_payoff, initS, riskFreeRate, dividendRate, volatility, maturity, n, antithetic=False, control_strike=None, moment_matching=False, drift=0.0, rng=None, confidence=0.95, batches=50):
+    rng = np.random.default_rng(rng)
+    discount = exp(-riskFreeRate * maturity)
+    stdev = volatility * sqrt(maturity)
+    mu = (riskFreeRate - dividendRate - 0.5 * volatility**2) * maturity
+    cost = 2 if antithetic else 1
+    z = rng.standard_normal(n // cost)
+    plain = discount * func_payoff(initS * exp(mu + stdev * z))
+    if moment_matching:
+        z = z[:(len(z) // batches * batches)].reshape(batches, -1)
+        z = ((z - z.mean(axis=1, keepdims=True)) / z.std(axis=1, keepdims=True)).reshape(-1)
+
+    def simulate(z):
+        # change of measure from N(drift, 1) back to N(0, 1)
+        x = z + drift
+        weight = exp(-drift * x + 0.5 * drift**2)
+        ST = initS * exp(mu + stdev * x)
+        y = discount * func_payoff(ST) * weight
+        if control_strike is None:
+            return y, None
+        return y, discount * np.maximum(ST - control_strike, 0) * weight
+
+    y, control = simulate(z)
+    if antithetic:
+        y2, control2 = simulate(-z)
+        y = 0.5 * (y + y2)
+        if control is not None:
+            control = 0.5 * (control + control2)
+    if control is not None:
+        expectation = func_getCallPriceByBlackScholesFormula(
+            control_strike, initS, riskFreeRate, dividendRate, volatility, maturity)
+        covariance = np.cov(y, control)
+        b = covariance[0, 1] / covariance[1, 1] if covariance[1, 1] > 0 else 0
+        y = y - b * (control - expectation)
+
+    if moment_matching:
+        statistics = RunningStatistics().add(y.reshape(batches, -1).mean(axis=1))
+        result = func_getMCResult(statistics, confidence)
+        width = student_t.ppf(0.5 + 0.5 * confidence, batches - 1) * statistics.standard_error
+        result['lower'] = statistics.mean - width
+        result['upper'] = statistics.mean + width
+        result['paths'] = len(y)
+    else:
+        statistics = RunningStatistics().add(y)
+        result = func_getMCResult(statistics, confidence)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['variance_reduction'] = plain.var(ddof=1) / (result['standard_error']**2 * result['paths'] * cost)
+    return result
+
+## get variance-reduction factors of each technique alone and of all combined
+## K: execution price of the call priced
+## n: the number of payoff evaluations
+## rng: numpy.random.Generator or seed, shared by all runs
+## returns dict of technique and result of
+## func_getPriceByMCVarianceReduction_gbm
+def func_getVarianceReductionReport_gbm(K, initS, riskFreeRate, dividendRate, volatility, maturity, n, rng=None):
+    def func_payoff(x):
+        return np.maximum(x - K, 0)
+
+    drift = func_getImportanceDrift_gbm(
+        K, initS, riskFreeRate, dividendRate, volatility, maturity)
+    forward = initS * exp((riskFreeRate - dividendRate) * maturity)
+    techniques = {
+        'plain': {},
+        'antithetic': {'antithetic': True},
+        'control_variate': {'control_strike': forward},
+        'moment_matching': {'moment_matching': True},
+        'importance_sampling': {'drift': drift},
+        'combined': {
+            'antithetic': True, 'control_strike': forward,
+            'moment_matching': True, 'drift': drift
+        }
+    }
+    seed = np.random.default_rng(rng).integers(2**63)
+    return {
+        key: func_getPriceByMCVarianceReduction_gbm(
+            func_payoff, initS, riskFreeRate, dividendRate, volatility,
+            maturity, n, rng=seed, **settings)
+        for key, settings in techniques.items()
+    }
+
+
+if __name__ == '__main__':
+    initS, riskFreeRate, dividendRate, volatility, maturity = 100, 0.03, 0.01, 0.25, 1.0
+    for K in [100, 150, 250]:
+        exact = func_getCallPriceByBlackScholesFormula(
+            K, initS, riskFreeRate, dividendRate, volatility, maturity)
+        report = func_getVarianceReductionReport_gbm(
+            K, initS, riskFreeRate, dividendRate, volatility, maturity, 10**6, rng=0)
+        print('K = {0}, exact = {1:.6e}'.format(K, exact))
+        for key, result in report.items():
+            print('  {0:20s} price = {1:.6e}, error = {2:.2e}, factor = {3:.1f}'.format(
+                key, result['price'], result['standard_error'],
+                result['variance_reduction']))